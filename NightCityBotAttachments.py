@@ -0,0 +1,136 @@
+# NightCityBotAttachments.py
+# Concurrent, spooled attachment re-upload shared by relays and posts
+import asyncio
+import discord
+import logging
+import tempfile
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Discord rejects messages with more than 10 attachments
+MAX_FILES_PER_MESSAGE = 10
+
+
+@dataclass
+class PreparedAttachments:
+    """Files ready to re-upload, plus links for attachments that couldn't be."""
+    files: List[discord.File] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+    spools: List[tempfile.SpooledTemporaryFile] = field(default_factory=list)
+
+    def content_with_links(self, content: Optional[str]) -> Optional[str]:
+        """Append fallback links to message content."""
+        lines = [content] if content else []
+        lines.extend(f"📎 Attachment: {link}" for link in self.links)
+        return "\n".join(lines) or None
+
+    def close(self):
+        """Release spooled downloads, whether or not a send ever ran."""
+        # discord.File swaps fp.close for a no-op until a send restores it,
+        # so go through the class to really close the spool
+        for spool in self.spools:
+            tempfile.SpooledTemporaryFile.close(spool)
+        self.spools.clear()
+
+
+class AttachmentPipeline:
+    """
+    Downloads attachments for re-upload in parallel, with a concurrency cap.
+
+    One pipeline is shared by the whole bot (DMService owns it), so the cap
+    is process-wide. Each download is streamed into a SpooledTemporaryFile,
+    so small files stay in memory and large ones go to disk; once a download
+    passes the spool threshold its writes (including the rollover to disk)
+    run in a worker thread. Attachments that would push the message over the
+    destination's upload limit, or that fail to download, are passed back as
+    links instead.
+    """
+
+    def __init__(
+            self,
+            concurrency: int = 4,
+            spool_threshold: int = 1024 * 1024,
+            chunk_size: int = 64 * 1024,
+            timeout: float = 30.0,
+            trace_configs: Sequence[aiohttp.TraceConfig] = ()
+    ):
+        self.concurrency = concurrency
+        self.spool_threshold = spool_threshold
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.trace_configs = list(trace_configs)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=self.trace_configs
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def prepare(self, attachments: Sequence[discord.Attachment], size_limit: int) -> PreparedAttachments:
+        """
+        Download attachments that fit within size_limit for re-upload.
+        Attachments keep their original order; the ones that don't fit become links.
+        """
+        prepared = PreparedAttachments()
+        selected = []
+        budget = size_limit
+        for attachment in attachments:
+            if len(selected) < MAX_FILES_PER_MESSAGE and attachment.size <= budget:
+                selected.append(attachment)
+                budget -= attachment.size
+            else:
+                prepared.links.append(attachment.url)
+
+        spools = await asyncio.gather(*(self._download(attachment) for attachment in selected))
+
+        for attachment, spool in zip(selected, spools):
+            if spool is None:
+                prepared.links.append(attachment.url)
+                continue
+            prepared.spools.append(spool)
+            prepared.files.append(discord.File(
+                spool,
+                filename=attachment.filename,
+                description=attachment.description,
+                spoiler=attachment.is_spoiler()
+            ))
+
+        return prepared
+
+    async def _download(self, attachment: discord.Attachment) -> Optional[tempfile.SpooledTemporaryFile]:
+        """Stream one attachment into a spooled temp file, or return None on failure."""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
+        written = 0
+        try:
+            async with self._semaphore:
+                async with self._get_session().get(attachment.url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        written += len(chunk)
+                        if written > self.spool_threshold:
+                            await asyncio.to_thread(spool.write, chunk)
+                        else:
+                            spool.write(chunk)
+            spool.seek(0)
+            return spool
+        except asyncio.CancelledError:
+            spool.close()
+            raise
+        except Exception as e:
+            # Network errors, but also OSError from the spool (e.g. a full disk
+            # on rollover); failing here would leak the other downloads' spools
+            logger.warning(f"Failed to download attachment {attachment.filename}: {e}")
+            spool.close()
+            return None
@@ -1,20 +1,356 @@
 # NightCityBotAuditService.py
-
+# Batched, non-blocking audit logging to Discord and a local JSONL file
+import asyncio
 import discord
-from NightCityBot.NightCityBotConfig import AUDIT_LOG_CHANNEL_ID
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from discord.ext import commands
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional, Tuple
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotPermissions import is_fixer
+
+logger = logging.getLogger(__name__)
+
+# Discord limits per message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_FIELD_VALUE = 1024
 
 async def setup(bot):
     await bot.add_cog(AuditCog(bot))
 
-async def log_audit(bot, user, action_desc):
-    audit_channel = bot.get_channel(AUDIT_LOG_CHANNEL_ID)
+async def log_audit(bot, user, action_desc, action_type=None, target=None):
+    """Queue an audit entry on the bot's audit service."""
+    await bot.audit_service.log_audit(user, action_desc, action_type, target)
+
+
+@dataclass
+class AuditEntry:
+    timestamp: str
+    user_id: int
+    user: str
+    action: str
+    action_type: Optional[str] = None
+    target: Optional[str] = None
+
+    def to_embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="📝 Audit Log",
+            color=discord.Color.blue(),
+            timestamp=datetime.fromisoformat(self.timestamp)
+        )
+        embed.add_field(name="User", value=f"{self.user} ({self.user_id})", inline=False)
+        embed.add_field(name="Action", value=self.action[:MAX_FIELD_VALUE], inline=False)
+        if self.action_type:
+            embed.set_footer(text=f"{self.action_type} → {self.target}" if self.target else self.action_type)
+        return embed
+
+
+class AuditIndex:
+    """
+    SQLite index of audit entries, searchable by user, action type, target
+    and time. Calls are blocking; the service runs them with asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS audit ("
+                "id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, user_id INTEGER NOT NULL, "
+                "user TEXT NOT NULL, action_type TEXT, target TEXT, action TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS audit_time ON audit (timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS audit_user ON audit (user_id, timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS audit_type ON audit (action_type, timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS audit_target ON audit (target, timestamp)")
+
+    def insert_many(self, batch: List[AuditEntry]):
+        rows = [
+            (entry.timestamp, entry.user_id, entry.user, entry.action_type, entry.target, entry.action)
+            for entry in batch
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO audit (timestamp, user_id, user, action_type, target, action) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def query(
+            self,
+            user_id: Optional[int] = None,
+            action_type: Optional[str] = None,
+            target: Optional[str] = None,
+            since: Optional[datetime] = None,
+            limit: int = 10,
+            offset: int = 0
+    ) -> Tuple[List[AuditEntry], int]:
+        """Get a page of matching entries, newest first, and the total match count."""
+        clauses = []
+        params: List[Any] = []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if action_type:
+            clauses.append("action_type = ?")
+            params.append(action_type)
+        if target:
+            clauses.append("target = ?")
+            params.append(target)
+        if since:
+            # Timestamps are stored as UTC ISO strings, so they sort chronologically
+            clauses.append("timestamp >= ?")
+            params.append(since.astimezone(timezone.utc).isoformat())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM audit{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT timestamp, user_id, user, action, action_type, target FROM audit{where} "
+                f"ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [AuditEntry(*row) for row in rows], total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AuditService:
+    """
+    Audit sink that never blocks the caller.
+
+    log_audit only queues the entry. A background task collects entries
+    for up to AUDIT_FLUSH_DELAY seconds, appends them to a rotating JSONL
+    file, and posts them to the audit channel as up to 10 embeds per message.
+    """
+
+    def __init__(self, config: BotConfig):
+        self.config = config
+        self.bot = None  # Will be set by the bot instance
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self._warned_stopped = False
+        self.entries_logged = 0
+        self.messages_sent = 0
+        self.index: Optional[AuditIndex] = AuditIndex(config.AUDIT_DB_FILE)
+
+        os.makedirs(os.path.dirname(config.AUDIT_LOG_FILE) or ".", exist_ok=True)
+        self._file_logger = logging.getLogger(f"{__name__}.file")
+        self._file_logger.propagate = False
+        self._file_logger.setLevel(logging.INFO)
+        if not self._file_logger.handlers:
+            handler = RotatingFileHandler(
+                config.AUDIT_LOG_FILE,
+                maxBytes=config.AUDIT_LOG_MAX_BYTES,
+                backupCount=config.AUDIT_LOG_BACKUP_COUNT,
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._file_logger.addHandler(handler)
+
+    def set_bot(self, bot):
+        """Set the bot instance for this service."""
+        self.bot = bot
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush every queued entry, then stop the background task and close the index."""
+        # Set before queueing the sentinel so nothing can be queued behind it and lost
+        self._stopped = True
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    async def log_audit(self, user, action_desc: str, action_type: Optional[str] = None, target: Optional[str] = None):
+        """Queue an audit entry and return immediately."""
+        entry = AuditEntry(
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            user_id=user.id,
+            user=str(user),
+            action=action_desc,
+            action_type=action_type,
+            target=target
+        )
+        logger.info(f"[AUDIT] {user}: {action_desc}")
+
+        if self._stopped or self._task is None or self._task.done():
+            # Not running (e.g. during shutdown): keep the local record at least
+            if self._stopped and not self._warned_stopped:
+                logger.warning("Audit service is stopped; further entries only go to the local audit log")
+                self._warned_stopped = True
+            self._persist([entry])
+            return
+        self._queue.put_nowait(entry)
+
+    def pending_count(self) -> int:
+        return self._queue.qsize()
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+
+            # Give closely spaced actions a moment to share a message
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.config.AUDIT_FLUSH_DELAY
+            while len(batch) < self.config.AUDIT_BATCH_SIZE:
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to write audit batch: {e}")
+
+    async def query(self, **filters) -> Tuple[List[AuditEntry], int]:
+        """Search the local audit index; see AuditIndex.query."""
+        if self.index is None:
+            raise RuntimeError("audit index closed")
+        return await asyncio.to_thread(self.index.query, **filters)
+
+    async def _write_batch(self, batch: List[AuditEntry]):
+        await asyncio.to_thread(self._persist, batch)
+        self.entries_logged += len(batch)
+        await self._send_batch(batch)
+
+    def _persist(self, batch: List[AuditEntry]):
+        for entry in batch:
+            self._file_logger.info(json.dumps(asdict(entry), ensure_ascii=False))
+        if self.index is None:
+            return
+        try:
+            self.index.insert_many(batch)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to index {len(batch)} audit entries: {e}")
+
+    async def _send_batch(self, batch: List[AuditEntry]):
+        audit_channel = self.bot.get_channel(self.config.AUDIT_LOG_CHANNEL_ID) if self.bot else None
+        if not isinstance(audit_channel, discord.TextChannel):
+            logger.warning(f"[AUDIT] Skipped: Channel {self.config.AUDIT_LOG_CHANNEL_ID} is not a TextChannel")
+            return
+
+        embeds: List[discord.Embed] = []
+        size = 0
+        for entry in batch:
+            embed = entry.to_embed()
+            if embeds and (len(embeds) >= MAX_EMBEDS_PER_MESSAGE or size + len(embed) > MAX_EMBED_CHARS_PER_MESSAGE):
+                await self._send_embeds(audit_channel, embeds)
+                embeds, size = [], 0
+            embeds.append(embed)
+            size += len(embed)
+        if embeds:
+            await self._send_embeds(audit_channel, embeds)
+
+    async def _send_embeds(self, channel: discord.TextChannel, embeds: List[discord.Embed]):
+        try:
+            await channel.send(embeds=embeds)
+            self.messages_sent += 1
+        except discord.HTTPException as e:
+            logger.error(f"Failed to send {len(embeds)} audit embed(s): {e}")
+
+
+class AuditCog(commands.Cog):
+    """Cog that owns the audit service."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.audit_service = AuditService(bot.config)
+        self.audit_service.set_bot(bot)
+        bot.audit_service = self.audit_service
+
+    async def cog_load(self):
+        self.audit_service.start()
+
+    async def cog_unload(self):
+        await self.audit_service.stop()
+
+    @commands.command()
+    @is_fixer()
+    async def audit(self, ctx, *filters: str):
+        """
+        Search the audit log, newest first.
+        Filters: @user or user ID, type:<action type>, target:<name>, since:<7d|12h|30m|YYYY-MM-DD>, page:<n>
+        Example: !audit @Fixer type:post since:7d page:2
+        """
+        query: Dict[str, Any] = {}
+        page = 1
+        for token in filters:
+            key, _, value = token.partition(":")
+            mention = re.fullmatch(r"<@!?(\d+)>", token)
+            if mention or token.isdigit():
+                query["user_id"] = int(mention.group(1) if mention else token)
+            elif key == "type" and value:
+                query["action_type"] = value
+            elif key == "target" and value:
+                query["target"] = value
+            elif key == "since" and parse_since(value):
+                query["since"] = parse_since(value)
+            elif key == "page" and value.isdigit() and int(value) > 0:
+                page = int(value)
+            else:
+                await ctx.send(f"❌ Unknown audit filter `{token}`.")
+                return
+
+        page_size = self.bot.config.AUDIT_PAGE_SIZE
+        started = time.perf_counter()
+        entries, total = await self.audit_service.query(limit=page_size, offset=(page - 1) * page_size, **query)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if not entries:
+            await ctx.send("🔍 No matching audit entries.")
+            return
+
+        lines = []
+        for entry in entries:
+            ts = datetime.fromisoformat(entry.timestamp).strftime("%Y-%m-%d %H:%M")
+            kind = f" [{entry.action_type}{f' → {entry.target}' if entry.target else ''}]" if entry.action_type else ""
+            lines.append(f"`{ts}` **{entry.user}**{kind}: {entry.action[:150]}")
+
+        pages = (total + page_size - 1) // page_size
+        embed = discord.Embed(title="📝 Audit Search", description="\n".join(lines), color=discord.Color.blue())
+        embed.set_footer(text=f"Page {page}/{pages} · {total} entries · {elapsed:.1f}ms")
+        await ctx.send(embed=embed)
 
-    if isinstance(audit_channel, discord.TextChannel):
-        embed = discord.Embed(title="📝 Audit Log", color=discord.Color.blue())
-        embed.add_field(name="User", value=f"{user} ({user.id})", inline=False)
-        embed.add_field(name="Action", value=action_desc, inline=False)
-        await audit_channel.send(embed=embed)
-    else:
-        print(f"[AUDIT] Skipped: Channel {AUDIT_LOG_CHANNEL_ID} is not a TextChannel")
 
-    print(f"[AUDIT] {user}: {action_desc}")
+def parse_since(value: str) -> Optional[datetime]:
+    """Parse a relative (7d, 12h, 30m) or ISO date/time filter into a UTC datetime."""
+    match = re.fullmatch(r"(\d+)([dhm])", value)
+    if match:
+        unit = {"d": "days", "h": "hours", "m": "minutes"}[match.group(2)]
+        return datetime.now(timezone.utc) - timedelta(**{unit: int(match.group(1))})
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
@@ -0,0 +1,123 @@
+# NightCityBotChunker.py
+# Boundary-aware message chunking shared across services
+from typing import Iterable, Iterator, Tuple
+
+MESSAGE_LIMIT = 2000
+
+FENCE = "```"
+BOLD = "**"
+
+# Longest closing sequence a chunk may need: newline + fence + bold marker
+_CLOSER_RESERVE = len("\n" + FENCE + BOLD)
+_MAX_FENCE_LANG = 20
+
+
+def _markdown_state(text: str) -> Tuple[bool, str, bool]:
+    """
+    Get (inside code fence, fence language, bold left open) at the end of text.
+    Bold markers inside code fences don't count.
+    """
+    parts = text.split(FENCE)
+    in_fence = len(parts) % 2 == 0
+
+    lang = ""
+    if in_fence:
+        opening = parts[-1]
+        first_line = opening.split("\n", 1)[0]
+        if "\n" in opening and len(first_line) <= _MAX_FENCE_LANG and " " not in first_line:
+            lang = first_line
+
+    bold_markers = sum(part.count(BOLD) for part in parts[0::2])
+    return in_fence, lang, bold_markers % 2 == 1
+
+
+def _find_cut(window: str) -> int:
+    """
+    Find where to cut a window: the last newline, else the last space, in the
+    back half of the window; else any earlier boundary rather than splitting
+    a word or URL; else a hard cut.
+    """
+    floor = len(window) // 2
+    for boundary in ("\n", " "):
+        cut = window.rfind(boundary)
+        if cut > floor:
+            return cut
+
+    cut = max(window.rfind("\n"), window.rfind(" "))
+    return cut if cut > 0 else len(window)
+
+
+def iter_chunks(text: str, limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    """
+    Lazily split text into chunks of at most limit characters.
+
+    Splits prefer newlines, then spaces, so words and URLs stay intact.
+    A code fence or bold marker left open at a split is closed at the end
+    of the chunk and reopened at the start of the next one.
+    """
+    if len(text) <= limit:
+        if text:
+            yield text
+        return
+
+    pos = 0
+    reopen = ""
+    length = len(text)
+
+    while pos < length:
+        if len(reopen) + length - pos <= limit:
+            yield reopen + text[pos:]
+            return
+
+        budget = limit - len(reopen) - _CLOSER_RESERVE
+        window = text[pos:pos + budget]
+        cut = _find_cut(window)
+        body = reopen + window[:cut]
+
+        # Consume the boundary character we split on
+        pos += cut
+        if pos < length and text[pos] in "\n ":
+            pos += 1
+
+        in_fence, lang, bold_open = _markdown_state(body)
+        closer = ""
+        reopen = ""
+        if bold_open and not in_fence:
+            closer += BOLD
+            reopen += BOLD
+        if in_fence:
+            closer += "\n" + FENCE
+            reopen = FENCE + lang + "\n"
+
+        yield body + closer
+
+
+def pack_entries(entries: Iterable[str], limit: int = MESSAGE_LIMIT, separator: str = "\n") -> Iterator[str]:
+    """
+    Lazily pack short entries into as few messages as possible, in order.
+    Entries longer than the limit are split with iter_chunks.
+    """
+    buffer = ""
+    for entry in entries:
+        if not entry:
+            continue
+
+        if len(entry) > limit:
+            if buffer:
+                yield buffer
+            # Hold back the last piece so following entries can share its message
+            buffer = ""
+            for chunk in iter_chunks(entry, limit):
+                if buffer:
+                    yield buffer
+                buffer = chunk
+        elif not buffer:
+            buffer = entry
+        elif len(buffer) + len(separator) + len(entry) <= limit:
+            buffer += separator + entry
+        else:
+            yield buffer
+            buffer = entry
+
+    if buffer:
+        yield buffer
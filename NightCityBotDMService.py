@@ -1,57 +1,375 @@
 # services/dm_service.py
 # Direct message handling and thread management
+import asyncio
+import aiohttp
 import discord
 import json
 import logging
-from typing import Dict, Union, cast
+import os
+from collections import OrderedDict
+from discord.ext import commands
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union, cast
 from pathlib import Path
 from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotChunker import MESSAGE_LIMIT, iter_chunks, pack_entries
+from NightCityBot.NightCityBotAttachments import AttachmentPipeline
 
 logger = logging.getLogger(__name__)
 
 async def setup(bot):
     await bot.add_cog(DMCog(bot))
 
+class ThreadMapStore:
+    """
+    Crash-safe persistence for the DM thread map.
+
+    The map is kept as a compact JSON snapshot plus an append-only change
+    log beside it. Saving appends only the pending changes; once the log
+    grows past a threshold it is folded into a fresh snapshot written via
+    temp file + rename. All disk I/O runs off the event loop.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            source: Callable[[], Dict[str, int]],
+            compact_after: int,
+            flush_delay: float
+    ):
+        self.path = Path(path)
+        self.log_path = Path(f"{path}.log")
+        self.source = source
+        self.compact_after = compact_after
+        self.flush_delay = flush_delay
+
+        self._pending: List[Dict[str, Any]] = []
+        self._log_entries = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    def load(self) -> Dict[str, int]:
+        """Read the snapshot and replay the change log on top of it."""
+        mapping: Dict[str, int] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    mapping = {user_id: int(thread_id) for user_id, thread_id in json.load(f).items()}
+            except Exception as e:
+                logger.error(f"Failed to load thread map snapshot: {e}")
+
+        self._log_entries = 0
+        if self.log_path.exists():
+            with open(self.log_path, "rb+") as f:
+                content = f.read()
+                if content and not content.endswith(b"\n"):
+                    # Drop a torn final record so later appends start on a fresh line
+                    content = content[:content.rfind(b"\n") + 1]
+                    f.truncate(len(content))
+
+            for line in content.decode().splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("op") == "set":
+                    mapping[record["user"]] = int(record["thread"])
+                elif record.get("op") == "del":
+                    mapping.pop(record["user"], None)
+                self._log_entries += 1
+
+        return mapping
+
+    def record_set(self, user_id: str, thread_id: int):
+        self._pending.append({"op": "set", "user": user_id, "thread": thread_id})
+
+    def record_delete(self, user_id: str):
+        self._pending.append({"op": "del", "user": user_id})
+
+    async def flush(self):
+        """Persist pending changes. Concurrent callers share a single write."""
+        while self._pending:
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_batch())
+            await asyncio.shield(self._flush_task)
+
+    async def _flush_batch(self):
+        # Give changes made in the same burst a moment to join this batch
+        await asyncio.sleep(self.flush_delay)
+
+        async with self._write_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            try:
+                await asyncio.to_thread(self._append, batch)
+                self._log_entries += len(batch)
+            except Exception:
+                # Put the batch back so the next flush retries it
+                self._pending = batch + self._pending
+                raise
+
+            if self._log_entries >= self.compact_after:
+                await asyncio.to_thread(self._compact, dict(self.source()))
+                self._log_entries = 0
+
+    def _append(self, batch: List[Dict[str, Any]]):
+        with open(self.log_path, "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in batch))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, mapping: Dict[str, int]):
+        """Write a fresh snapshot atomically, then drop the folded log."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(mapping, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Replaying the old log over the new snapshot is harmless, so a crash here is safe
+        with open(self.log_path, "w"):
+            pass
+        logger.debug(f"Compacted DM thread map ({len(mapping)} mappings)")
+
+
+class ThreadOutbox:
+    """
+    Ordered, batched outbound queue for DM log threads.
+
+    Each thread gets a single worker that merges queued entries, in order,
+    into as few 2000-character messages as possible. A batch is flushed
+    after a short delay, or immediately once a full message is buffered.
+    """
+
+    MAX_SEND_ATTEMPTS = 3
+
+    def __init__(self, flush_delay: float):
+        self.flush_delay = flush_delay
+        self._pending: Dict[int, List[str]] = {}
+        self._pending_size: Dict[int, int] = {}
+        self._threads: Dict[int, Union[discord.Thread, discord.TextChannel]] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.entries_queued = 0
+        self.messages_sent = 0
+
+    def enqueue(self, thread: Union[discord.Thread, discord.TextChannel], content: str):
+        """Queue an entry for a thread."""
+        thread_id = thread.id
+        self._threads[thread_id] = thread
+        self._pending.setdefault(thread_id, []).append(content)
+        self._pending_size[thread_id] = self._pending_size.get(thread_id, 0) + len(content) + 1
+        self.entries_queued += 1
+
+        if thread_id not in self._workers:
+            self._wakeups[thread_id] = asyncio.Event()
+            self._workers[thread_id] = asyncio.create_task(self._drain(thread_id))
+        elif self._pending_size[thread_id] >= MESSAGE_LIMIT:
+            self._wakeups[thread_id].set()
+
+    def pending_count(self) -> int:
+        """Get the number of queued entries across all threads."""
+        return sum(len(entries) for entries in self._pending.values())
+
+    async def flush_all(self):
+        """Wait until every queued entry has been sent."""
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def _drain(self, thread_id: int):
+        wakeup = self._wakeups[thread_id]
+        try:
+            while self._pending.get(thread_id):
+                if self._pending_size[thread_id] < MESSAGE_LIMIT:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), self.flush_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                wakeup.clear()
+
+                entries = self._pending.pop(thread_id)
+                self._pending_size[thread_id] = 0
+                thread = self._threads[thread_id]
+                for message in pack_entries(entries, MESSAGE_LIMIT):
+                    await self._send(thread, message)
+        finally:
+            self._workers.pop(thread_id, None)
+            self._wakeups.pop(thread_id, None)
+            # Anything left behind (e.g. on cancellation) is picked up by the next enqueue
+            if not self._pending.get(thread_id):
+                self._pending.pop(thread_id, None)
+                self._pending_size.pop(thread_id, None)
+                self._threads.pop(thread_id, None)
+
+    async def _send(self, thread: Union[discord.Thread, discord.TextChannel], content: str):
+        for attempt in range(self.MAX_SEND_ATTEMPTS):
+            try:
+                await thread.send(content)
+                self.messages_sent += 1
+                return
+            except discord.RateLimited as e:
+                retry_after = e.retry_after
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    logger.error(f"Failed to log to thread {thread.id}: {e}")
+                    return
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+
+            logger.warning(f"Rate limited logging to thread {thread.id}, retrying in {retry_after:.2f}s")
+            await asyncio.sleep(retry_after)
+
+        logger.error(f"Gave up logging to thread {thread.id} after {self.MAX_SEND_ATTEMPTS} attempts")
+
+
 class DMService:
     """Service for handling DM logging and thread management."""
 
-    def __init__(self, config: BotConfig):
+    def __init__(self, config: BotConfig, trace_configs: Sequence[aiohttp.TraceConfig] = ()):
         self.config = config
         self.dm_threads: Dict[str, int] = {}
+        self.thread_users: Dict[int, str] = {}
+        self.thread_store = ThreadMapStore(
+            config.THREAD_MAP_FILE,
+            lambda: self.dm_threads,
+            config.THREAD_MAP_COMPACT_AFTER,
+            config.THREAD_MAP_FLUSH_DELAY
+        )
+        self._thread_cache: OrderedDict[int, Union[discord.Thread, discord.TextChannel]] = OrderedDict()
+        self.thread_cache_hits = 0
+        self.thread_fetches = 0
+        self._thread_requests: Dict[str, asyncio.Task] = {}
+        self.outbox = ThreadOutbox(config.DM_LOG_FLUSH_DELAY)
+        self.thread_requests_started = 0
+        self.thread_requests_coalesced = 0
+        self.attachments = AttachmentPipeline(
+            config.ATTACHMENT_CONCURRENCY,
+            config.ATTACHMENT_SPOOL_THRESHOLD,
+            config.ATTACHMENT_CHUNK_SIZE,
+            config.ATTACHMENT_TIMEOUT,
+            trace_configs
+        )
         self.bot = None  # Will be set by the bot instance
 
     def set_bot(self, bot):
         """Set the bot instance for this service."""
         self.bot = bot
 
+    def _set_thread(self, user_id: str, thread_id: int):
+        """Map a user to their DM thread, keeping the reverse index in sync."""
+        old_thread_id = self.dm_threads.get(user_id)
+        if old_thread_id is not None:
+            self.thread_users.pop(old_thread_id, None)
+        self.dm_threads[user_id] = thread_id
+        self.thread_users[thread_id] = user_id
+        self.thread_store.record_set(user_id, thread_id)
+
+    def _remove_thread(self, user_id: str):
+        """Forget a user's DM thread in both directions."""
+        thread_id = self.dm_threads.pop(user_id, None)
+        if thread_id is not None:
+            self.thread_users.pop(thread_id, None)
+            self.thread_store.record_delete(user_id)
+
+    def get_thread_user(self, thread_id: int) -> Optional[str]:
+        """Get the user id a DM thread belongs to, if any."""
+        return self.thread_users.get(thread_id)
+
     async def load_thread_map(self):
         """Load the thread mapping from file."""
-        thread_map_path = Path(self.config.THREAD_MAP_FILE)
-        if thread_map_path.exists():
-            try:
-                with open(thread_map_path, "r") as f:
-                    self.dm_threads = json.load(f)
-                logger.info(f"Loaded {len(self.dm_threads)} DM thread mappings")
-            except Exception as e:
-                logger.error(f"Failed to load thread map: {e}")
-                self.dm_threads = {}
-        else:
+        try:
+            self.dm_threads = await asyncio.to_thread(self.thread_store.load)
+            logger.info(f"Loaded {len(self.dm_threads)} DM thread mappings")
+        except Exception as e:
+            logger.error(f"Failed to load thread map: {e}")
             self.dm_threads = {}
 
+        self.thread_users = {thread_id: user_id for user_id, thread_id in self.dm_threads.items()}
+
     async def save_thread_map(self):
-        """Save the thread mapping to file."""
+        """Persist changes to the thread mapping."""
         try:
-            with open(self.config.THREAD_MAP_FILE, "w") as f:
-                json.dump(self.dm_threads, f, indent=2)
+            await self.thread_store.flush()
             logger.debug("Saved DM thread mappings")
         except Exception as e:
             logger.error(f"Failed to save thread map: {e}")
 
+    async def forget_thread(self, thread_id: int):
+        """Drop the mapping for a DM thread that no longer exists."""
+        user_id = self.get_thread_user(thread_id)
+        if user_id is None:
+            return
+        self._remove_thread(user_id)
+        await self.save_thread_map()
+
+    async def _resolve_thread(self, thread_id: int) -> Union[discord.Thread, discord.TextChannel]:
+        """
+        Resolve a thread id, preferring the gateway cache, then the recently
+        used thread LRU, and only then a REST fetch.
+        Raises discord.NotFound if the thread no longer exists.
+        """
+        thread = self.bot.get_channel(thread_id)
+        if thread is None:
+            guild = self.bot.get_guild(self.config.GUILD_ID)
+            thread = guild.get_thread(thread_id) if guild else None
+
+        if thread is None:
+            # Archived threads drop out of the gateway cache
+            thread = self._thread_cache.get(thread_id)
+
+        if thread is None:
+            self.thread_fetches += 1
+            thread = await self.bot.fetch_channel(thread_id)
+        else:
+            self.thread_cache_hits += 1
+
+        thread = cast(Union[discord.Thread, discord.TextChannel], thread)
+        self._cache_thread(thread)
+        return thread
+
+    def _cache_thread(self, thread: Union[discord.Thread, discord.TextChannel]):
+        self._thread_cache[thread.id] = thread
+        self._thread_cache.move_to_end(thread.id)
+        while len(self._thread_cache) > self.config.DM_THREAD_CACHE_SIZE:
+            self._thread_cache.popitem(last=False)
+
+    def invalidate_thread(self, thread_id: int):
+        """Drop a thread from the resolution cache after it changed or was deleted."""
+        self._thread_cache.pop(thread_id, None)
+
     async def get_or_create_dm_thread(self, user: discord.User) -> Union[discord.Thread, discord.TextChannel]:
-        """Get existing DM thread or create a new one."""
+        """
+        Get existing DM thread or create a new one.
+        Concurrent calls for the same user share a single in-flight lookup/creation.
+        """
         if not self.bot:
             raise RuntimeError("Bot instance not set")
 
+        user_id = str(user.id)
+        pending = self._thread_requests.get(user_id)
+        if pending is not None:
+            self.thread_requests_coalesced += 1
+            logger.debug(f"Joining in-flight thread lookup for {user.name} ({user_id})")
+            return await asyncio.shield(pending)
+
+        task = asyncio.create_task(self._get_or_create_dm_thread(user))
+        self._thread_requests[user_id] = task
+        self.thread_requests_started += 1
+        # Clear the slot when the task finishes, even if every waiter was cancelled
+        task.add_done_callback(lambda _: self._thread_requests.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    def single_flight_stats(self) -> Dict[str, int]:
+        """Get counters for shared DM thread lookups."""
+        return {
+            "started": self.thread_requests_started,
+            "coalesced": self.thread_requests_coalesced,
+            "in_flight": len(self._thread_requests)
+        }
+
+    async def _get_or_create_dm_thread(self, user: discord.User) -> Union[discord.Thread, discord.TextChannel]:
         log_channel = self.bot.get_channel(self.config.DM_INBOX_CHANNEL_ID)
         user_id = str(user.id)
 
@@ -60,12 +378,13 @@ class DMService:
         # Try to reuse existing thread
         if user_id in self.dm_threads:
             try:
-                thread = await self.bot.fetch_channel(self.dm_threads[user_id])
+                thread = await self._resolve_thread(self.dm_threads[user_id])
                 logger.debug(f"Reusing existing thread {thread.id}")
-                return cast(Union[discord.Thread, discord.TextChannel], thread)
+                return thread
             except discord.NotFound:
                 logger.debug("Existing thread not found, creating new one")
-                del self.dm_threads[user_id]
+                self.invalidate_thread(self.dm_threads[user_id])
+                self._remove_thread(user_id)
 
         # Create new thread
         thread_name = f"{user.name}-{user.id}".replace(" ", "-").lower()[:100]
@@ -93,7 +412,8 @@ class DMService:
 
         # Store thread mapping
         thread = cast(Union[discord.Thread, discord.TextChannel], thread)
-        self.dm_threads[user_id] = thread.id
+        self._set_thread(user_id, thread.id)
+        self._cache_thread(thread)
         await self.save_thread_map()
 
         logger.info(f"Created new DM thread {thread.name} ({thread.id})")
@@ -122,19 +442,12 @@ class DMService:
                 logger.debug(f"Skipped logging command: {message.content}")
                 return
 
-            # Log message content
+            # Log message content and attachments as a single entry
             content = message.content or "*(No text content)*"
-            await self._send_to_thread(
-                thread,
-                f"📥 **Received from {message.author.display_name}**:\n{content}"
-            )
-
-            # Log attachments
+            entry = f"📥 **Received from {message.author.display_name}**:\n{content}"
             for attachment in message.attachments:
-                await self._send_to_thread(
-                    thread,
-                    f"📎 Received attachment: {attachment.url}"
-                )
+                entry += f"\n📎 Received attachment: {attachment.url}"
+            await self._send_to_thread(thread, entry)
 
         except Exception as e:
             logger.error(f"DM logging failed for {message.author}: {e}")
@@ -145,42 +458,51 @@ class DMService:
             return
 
         # Check if this is a known DM thread
-        for user_id, thread_id in self.dm_threads.items():
-            if message.channel.id == thread_id:
-                # Check if sender is a Fixer
-                if not any(role.name == self.config.FIXER_ROLE_NAME for role in message.author.roles):
-                    return
+        user_id = self.get_thread_user(message.channel.id)
+        if user_id is None:
+            return
 
-                try:
-                    target_user = await self.bot.fetch_user(int(user_id))
-                    if not target_user:
-                        return
-
-                    # Handle !roll commands specially
-                    if message.content.strip().lower().startswith("!roll"):
-                        await self._handle_roll_command(message, target_user)
-                        return
-
-                    # Relay normal message
-                    files = [await a.to_file() for a in message.attachments]
-                    await target_user.send(content=message.content or None, files=files)
-
-                    # Log the relay
-                    await self._send_to_thread(
-                        message.channel,
-                        f"📤 **Sent to {target_user.display_name} by {message.author.display_name}:**\n{message.content}"
-                    )
-
-                    # Delete original message
-                    try:
-                        await message.delete()
-                    except Exception as e:
-                        logger.warning(f"Couldn't delete relayed message: {e}")
+        # Check if sender is a Fixer
+        if not self.bot.role_index.has_category(message.author, "fixer"):
+            return
 
-                except Exception as e:
-                    logger.error(f"Failed to relay message: {e}")
+        try:
+            target_user = await self.bot.fetch_user(int(user_id))
+            if not target_user:
+                return
+
+            # Handle !roll commands specially
+            if message.content.strip().lower().startswith("!roll"):
+                await self._handle_roll_command(message, target_user)
+                return
+
+            # Relay normal message; DMs get the default upload limit
+            prepared = await self.attachments.prepare(
+                message.attachments,
+                discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+            )
+            try:
+                chunks = list(iter_chunks(prepared.content_with_links(message.content) or "")) or [None]
+                for chunk in chunks[:-1]:
+                    await target_user.send(content=chunk)
+                await target_user.send(content=chunks[-1], files=prepared.files)
+            finally:
+                prepared.close()
+
+            # Log the relay
+            await self._send_to_thread(
+                message.channel,
+                f"📤 **Sent to {target_user.display_name} by {message.author.display_name}:**\n{message.content}"
+            )
 
-                break
+            # Delete original message
+            try:
+                await message.delete()
+            except Exception as e:
+                logger.warning(f"Couldn't delete relayed message: {e}")
+
+        except Exception as e:
+            logger.error(f"Failed to relay message: {e}")
 
     async def _handle_roll_command(self, message: discord.Message, target_user: discord.User):
         """Handle !roll command in thread relay."""
@@ -204,14 +526,8 @@ class DMService:
             logger.warning(f"Couldn't delete relayed !roll message: {e}")
 
     async def _send_to_thread(self, thread: Union[discord.Thread, discord.TextChannel], content: str):
-        """Send content to thread, splitting if too long."""
-        if len(content) <= 2000:
-            await thread.send(content)
-        else:
-            # Split into chunks
-            chunks = [content[i:i + 1990] for i in range(0, len(content), 1990)]
-            for chunk in chunks:
-                await thread.send(chunk)
+        """Queue content for the thread; the outbox batches and splits it."""
+        self.outbox.enqueue(thread, content)
 
     async def log_outgoing_dm(self, user: discord.User, content: str, sender_name: str):
         """Log an outgoing DM to the user's thread."""
@@ -222,4 +538,53 @@ class DMService:
                 f"📤 **Sent to {user.display_name} by {sender_name}:**\n{content}"
             )
         except Exception as e:
-            logger.error(f"Failed to log outgoing DM: {e}")
\ No newline at end of file
+            logger.error(f"Failed to log outgoing DM: {e}")
+
+
+class DMCog(commands.Cog):
+    """Cog that owns the DM service and keeps it in sync with gateway events."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        api_calls = getattr(bot, "api_calls", None)
+        self.dm_service = DMService(
+            bot.config,
+            trace_configs=[api_calls.trace_config()] if api_calls else ()
+        )
+        self.dm_service.set_bot(bot)
+        bot.dm_service = self.dm_service
+
+    async def cog_load(self):
+        await self.dm_service.load_thread_map()
+
+    async def cog_unload(self):
+        await self.dm_service.outbox.flush_all()
+        await self.dm_service.save_thread_map()
+        await self.dm_service.attachments.close()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Log incoming DMs to their thread and relay Fixer replies from DM threads."""
+        if message.author.bot:
+            return
+
+        if isinstance(message.channel, discord.DMChannel):
+            await self.dm_service.handle_dm_message(message)
+        elif (
+                isinstance(message.channel, discord.Thread)
+                and self.dm_service.get_thread_user(message.channel.id) is not None
+        ):
+            # Commands other than !roll run normally in the thread instead of being relayed
+            content = message.content.strip().lower()
+            if content.startswith("!") and not content.startswith("!roll"):
+                return
+            await self.dm_service.handle_thread_relay(message)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before: discord.Thread, after: discord.Thread):
+        self.dm_service.invalidate_thread(after.id)
+
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        self.dm_service.invalidate_thread(payload.thread_id)
+        await self.dm_service.forget_thread(payload.thread_id)
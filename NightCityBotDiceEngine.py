@@ -0,0 +1,337 @@
+# NightCityBotDiceEngine.py
+# Dice expression compiler and batched rolling with limits and summaries for large pools
+import asyncio
+import random
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# One signed term: NdS with optional explode and keep-highest/lowest (either order), or a constant
+_TERM = re.compile(r"([+-]?)(?:(\d*)d(\d+)(!)?(?:(kh|kl)(\d+))?(!)?|(\d+))")
+
+# Explosions stop after this many rounds even if max faces keep coming up
+MAX_EXPLOSION_ROUNDS = 100
+
+
+class DiceExpressionError(ValueError):
+    """Raised for dice expressions that can't be parsed."""
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    sign: int
+    count: int
+    sides: int
+    keep: Optional[str] = None  # "kh" or "kl"
+    keep_count: int = 0
+    explode: bool = False
+    faces: range = field(init=False, repr=False, compare=False)
+    simple: bool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Precomputed once per plan so evaluation doesn't rebuild them on every roll
+        object.__setattr__(self, "faces", range(1, self.sides + 1))
+        object.__setattr__(self, "simple", self.keep is None and not self.explode)
+
+    def __str__(self) -> str:
+        text = f"{self.count}d{self.sides}"
+        if self.explode:
+            text += "!"
+        if self.keep:
+            text += f"{self.keep}{self.keep_count}"
+        return text
+
+
+@dataclass(frozen=True)
+class DicePlan:
+    """A compiled dice expression: dice terms plus a folded constant modifier."""
+    terms: Tuple[DiceTerm, ...]
+    modifier: int
+    display: str
+    dice_count: int = field(init=False, repr=False, compare=False)
+    simple: bool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "dice_count", sum(term.count for term in self.terms))
+        object.__setattr__(self, "simple", all(term.simple for term in self.terms))
+
+
+class DiceCompiler:
+    """
+    Compiles expressions like `2d6+1d4+3`, `4d6kh3` or `3d10!` into DicePlans.
+    Plans are cached in a bounded LRU keyed by the normalized expression, so
+    repeated rolls skip parsing.
+    """
+
+    def __init__(self, cache_size: int = 512, max_length: int = 100, max_terms: int = 20):
+        self.cache_size = cache_size
+        self.max_length = max_length
+        self.max_terms = max_terms
+        self._cache: OrderedDict[str, DicePlan] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(expression: str) -> str:
+        return "".join(expression.split()).lower()
+
+    def compile(self, expression: str) -> DicePlan:
+        key = self.normalize(expression)
+        plan = self._cache.get(key)
+        if plan is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return plan
+
+        self.misses += 1
+        plan = self._parse(key)
+        self._cache[key] = plan
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def _parse(self, text: str) -> DicePlan:
+        if not text or len(text) > self.max_length:
+            raise DiceExpressionError(text)
+
+        terms: List[DiceTerm] = []
+        modifier = 0
+        leading_number: Optional[int] = None
+        pos = 0
+        while pos < len(text):
+            match = _TERM.match(text, pos)
+            # Every term after the first needs an explicit sign
+            if not match or match.end() == pos or (pos and not match.group(1)):
+                raise DiceExpressionError(text)
+            pos = match.end()
+
+            sign_text, count, sides, explode, keep, keep_count, explode_after, constant = match.groups()
+            sign = -1 if sign_text == "-" else 1
+            if constant is not None:
+                if match.start() == 0 and not sign_text:
+                    leading_number = int(constant)
+                modifier += sign * int(constant)
+                continue
+
+            term = DiceTerm(
+                sign=sign,
+                count=int(count) if count else 1,
+                sides=int(sides),
+                keep=keep,
+                keep_count=int(keep_count) if keep_count else 0,
+                explode=bool(explode or explode_after)
+            )
+            if term.keep and not 0 < term.keep_count <= term.count:
+                raise DiceExpressionError(text)
+            if (explode and explode_after) or (term.explode and term.sides < 2):
+                raise DiceExpressionError(text)
+            terms.append(term)
+
+        # As in the original `!roll 20+3` syntax, with no NdS term the leading number is a die
+        if not terms and leading_number is not None:
+            modifier -= leading_number
+            terms.append(DiceTerm(sign=1, count=1, sides=leading_number))
+
+        if not terms or len(terms) > self.max_terms:
+            raise DiceExpressionError(text)
+
+        display = ""
+        for term in terms:
+            if display:
+                display += f" {'-' if term.sign < 0 else '+'} {term}"
+            else:
+                display = f"-{term}" if term.sign < 0 else str(term)
+        if modifier:
+            display += f" {'+' if modifier >= 0 else '-'} {abs(modifier)}"
+
+        return DicePlan(terms=tuple(terms), modifier=modifier, display=display)
+
+
+@dataclass
+class RollResult:
+    """Outcome of rolling count dice with the given number of sides."""
+    count: int
+    sides: int
+    total: int
+    rolls: Optional[List[int]] = None  # Only kept for pools small enough to list
+    histogram: Optional[Dict[int, int]] = None  # Only kept for pools too large to list
+
+    @property
+    def counts(self) -> Dict[int, int]:
+        """Hits per face, in face order."""
+        if self.histogram is not None:
+            return self.histogram
+        return dict(sorted(Counter(self.rolls).items()))
+
+    @property
+    def minimum(self) -> int:
+        return min(self.rolls) if self.rolls is not None else min(self.histogram)
+
+    @property
+    def maximum(self) -> int:
+        return max(self.rolls) if self.rolls is not None else max(self.histogram)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class TermResult:
+    term: DiceTerm
+    roll: RollResult
+    total: int  # Total of the kept dice, before the term's sign
+    dropped: Optional[Dict[int, int]] = None
+
+
+@dataclass
+class PlanResult:
+    plan: DicePlan
+    terms: List[TermResult]
+    total: int
+
+
+class DiceEngine:
+    """
+    Rolls dice pools in fixed-size batches so memory stays flat.
+
+    Pools up to list_threshold keep every die so they can be listed;
+    larger pools only keep a histogram. Pools of offload_threshold dice or
+    more are rolled in a worker thread so the event loop stays responsive.
+    """
+
+    def __init__(
+            self,
+            max_count: int = 1_000_000,
+            max_sides: int = 1000,
+            list_threshold: int = 100,
+            offload_threshold: int = 20_000,
+            batch_size: int = 65_536,
+            rng: Optional[random.Random] = None
+    ):
+        self.max_count = max_count
+        self.max_sides = max_sides
+        self.list_threshold = list_threshold
+        self.offload_threshold = offload_threshold
+        self.batch_size = batch_size
+        self.rng = rng or random.Random()
+
+    def validate_plan(self, plan: DicePlan) -> Optional[str]:
+        """Get an error message if any term, or the plan as a whole, is outside the limits."""
+        for term in plan.terms:
+            error = self.validate(term.count, term.sides)
+            if error:
+                return error
+        return self.validate(plan.dice_count, 1)
+
+    def validate(self, count: int, sides: int) -> Optional[str]:
+        """Get an error message if the pool is outside the configured limits."""
+        if count < 1 or sides < 1:
+            return "🎲 Dice count and sides must be at least 1."
+        if count > self.max_count:
+            return f"🎲 That's too many dice, the limit is {self.max_count:,}."
+        if sides > self.max_sides:
+            return f"🎲 Dice can have at most {self.max_sides:,} sides."
+        return None
+
+    def roll_sync(self, count: int, sides: int) -> RollResult:
+        faces = range(1, sides + 1)
+        choices = self.rng.choices
+
+        if count <= self.list_threshold:
+            rolls = choices(faces, k=count)
+            return RollResult(count, sides, sum(rolls), rolls=rolls)
+
+        histogram: Counter = Counter()
+        remaining = count
+        while remaining > 0:
+            batch = min(remaining, self.batch_size)
+            histogram.update(choices(faces, k=batch))
+            remaining -= batch
+
+        return RollResult(
+            count=count,
+            sides=sides,
+            total=sum(face * hits for face, hits in histogram.items()),
+            histogram=dict(sorted(histogram.items()))
+        )
+
+    async def roll(self, count: int, sides: int) -> RollResult:
+        if count >= self.offload_threshold:
+            return await asyncio.to_thread(self.roll_sync, count, sides)
+        return self.roll_sync(count, sides)
+
+    def evaluate_sync(self, plan: DicePlan) -> PlanResult:
+        if plan.simple and plan.dice_count <= self.list_threshold:
+            return self._evaluate_small(plan)
+
+        terms = []
+        for term in plan.terms:
+            roll = self.roll_sync(term.count, term.sides)
+            if term.simple:
+                terms.append(TermResult(term, roll, roll.total))
+                continue
+            if term.explode:
+                self._explode(roll)
+            terms.append(self._keep(term, roll))
+
+        total = plan.modifier + sum(result.term.sign * result.total for result in terms)
+        return PlanResult(plan, terms, total)
+
+    def _evaluate_small(self, plan: DicePlan) -> PlanResult:
+        """Fast path for the common case: a few plain NdS terms, every die listed."""
+        choices = self.rng.choices
+        terms = []
+        total = plan.modifier
+        for term in plan.terms:
+            rolls = choices(term.faces, k=term.count)
+            subtotal = sum(rolls)
+            terms.append(TermResult(term, RollResult(term.count, term.sides, subtotal, rolls), subtotal))
+            total += term.sign * subtotal
+        return PlanResult(plan, terms, total)
+
+    async def evaluate(self, plan: DicePlan) -> PlanResult:
+        if plan.dice_count >= self.offload_threshold:
+            return await asyncio.to_thread(self.evaluate_sync, plan)
+        return self.evaluate_sync(plan)
+
+    def _explode(self, roll: RollResult):
+        """Reroll every die showing its max face, adding the new dice, until none do."""
+        pending = roll.counts.get(roll.sides, 0)
+        rounds = 0
+        while pending and rounds < MAX_EXPLOSION_ROUNDS:
+            extra = self.roll_sync(pending, roll.sides)
+            if roll.rolls is not None and extra.rolls is not None:
+                roll.rolls.extend(extra.rolls)
+            else:
+                histogram = Counter(roll.counts)
+                histogram.update(extra.counts)
+                roll.histogram = dict(sorted(histogram.items()))
+                roll.rolls = None
+            roll.count += extra.count
+            roll.total += extra.total
+            pending = extra.counts.get(roll.sides, 0)
+            rounds += 1
+
+    @staticmethod
+    def _keep(term: DiceTerm, roll: RollResult) -> TermResult:
+        if not term.keep:
+            return TermResult(term, roll, roll.total)
+
+        counts = roll.counts
+        faces = sorted(counts, reverse=term.keep == "kh")
+        remaining = term.keep_count
+        total = 0
+        dropped = dict(counts)
+        for face in faces:
+            if remaining <= 0:
+                break
+            taken = min(remaining, counts[face])
+            total += face * taken
+            remaining -= taken
+            dropped[face] -= taken
+        return TermResult(term, roll, total, {face: hits for face, hits in dropped.items() if hits})
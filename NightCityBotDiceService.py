@@ -3,9 +3,12 @@
 
 import discord
 from discord.ext import commands
-import random
-import re
 from typing import cast
+from NightCityBot.NightCityBotChunker import iter_chunks
+from NightCityBot.NightCityBotDiceEngine import DiceCompiler, DiceEngine, DiceExpressionError, PlanResult, TermResult
+
+# Rolls are logged to DM threads through bot.dm_service
+DEPENDS_ON = ("NightCityBot.NightCityBotDMService",)
 
 async def setup(bot):
     await bot.add_cog(DiceCog(bot))
@@ -14,56 +17,102 @@ class DiceModule(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.DM_INBOX_CHANNEL_ID = 1366880900599517214
+        config = bot.config
+        self.histogram_max_sides = config.DICE_HISTOGRAM_MAX_SIDES
+        self.engine = DiceEngine(
+            max_count=config.DICE_MAX_COUNT,
+            max_sides=config.DICE_MAX_SIDES,
+            list_threshold=config.DICE_LIST_THRESHOLD,
+            offload_threshold=config.DICE_OFFLOAD_THRESHOLD
+        )
+        self.compiler = DiceCompiler(config.DICE_PLAN_CACHE_SIZE)
+
+    def format_term(self, result: TermResult, summarize: bool = False) -> str:
+        """List every die for small pools (dropped dice struck out), otherwise summarize the pool."""
+        roll = result.roll
+        if roll.rolls is not None and not summarize:
+            dropped = dict(result.dropped or {})
+            shown = []
+            for value in roll.rolls:
+                if dropped.get(value):
+                    dropped[value] -= 1
+                    shown.append(f"~~{value}~~")
+                else:
+                    shown.append(f"**{value}**")
+            return ", ".join(shown)
+
+        summary = f"min **{roll.minimum}**, max **{roll.maximum}**, mean {roll.mean:.2f}"
+        if result.term.keep:
+            summary += f", kept {result.term.keep_count:,} totalling {result.total:,}"
+        if roll.sides <= self.histogram_max_sides:
+            counts = ", ".join(f"{face}: {hits:,}" for face, hits in roll.counts.items())
+            summary += f"\n**Distribution:** {counts}"
+        return summary
+
+    def format_results(self, result: PlanResult) -> str:
+        # The list threshold covers the whole roll, not each term, so listed terms can't add up past 2000 characters
+        dice_rolled = sum(term.roll.count for term in result.terms)
+        summarize = dice_rolled > self.engine.list_threshold
+        listed = not summarize and all(term.roll.rolls is not None for term in result.terms)
+        label = "**Results:**" if listed else "**Summary:**"
+
+        if len(result.terms) == 1:
+            return f"{label} {self.format_term(result.terms[0], summarize)}"
+
+        lines = [f"`{term.term}`: {self.format_term(term, summarize)}" for term in result.terms]
+        return f"{label}\n" + "\n".join(lines)
+
+    @staticmethod
+    async def send_chunked(destination, content: str):
+        """Send content split into as many messages as it needs."""
+        for chunk in iter_chunks(content):
+            await destination.send(chunk)
 
     async def get_or_create_dm_thread(self, user: discord.User):
         """Get or create a DM thread for logging purposes"""
-        from threading_utils import get_or_create_dm_thread  # Import from your existing module
-        return await get_or_create_dm_thread(user)
+        return await self.bot.dm_service.get_or_create_dm_thread(user)
 
     async def loggable_roll(self, author, channel, dice: str, *, original_sender=None):
         """
         Process dice rolls with netrunner bonuses and proper logging
         """
-        dice_pattern = r'(?:(\d*)d)?(\d+)([+-]\d+)?'
-        match = re.fullmatch(dice_pattern, dice.replace(' ', ''))
-
-        if not match:
+        try:
+            plan = self.compiler.compile(dice)
+        except DiceExpressionError:
             if isinstance(channel, (discord.TextChannel, discord.Thread, discord.DMChannel)):
-                await channel.send('🎲 Format: `!roll XdY+Z` (Example: `!roll 2d6+3`)')
+                await channel.send(
+                    '🎲 Format: `!roll XdY+Z` (Example: `!roll 2d6+1d4+3`). '
+                    'Add `kh`/`kl` to keep the highest/lowest dice (`4d6kh3`) or `!` to explode (`3d10!`).'
+                )
             return
 
-        dice_count, dice_sides, modifier = match.groups()
-        dice_count = int(dice_count) if dice_count else 1
-        dice_sides = int(dice_sides)
-        modifier = int(modifier) if modifier else 0
+        error = self.engine.validate_plan(plan)
+        if error:
+            if isinstance(channel, (discord.TextChannel, discord.Thread, discord.DMChannel)):
+                await channel.send(error)
+            return
 
         # Calculate netrunner bonus
-        user_roles = [role.name for role in getattr(author, "roles", [])]
-        bonus = 0
-        if "Netrunner Level 2" in user_roles:
-            bonus = 1
-        elif "Netrunner Level 3" in user_roles:
-            bonus = 2
+        bonus = self.bot.role_index.best_value(author, "netrunner")
 
         # Roll dice
-        rolls = [random.randint(1, dice_sides) for _ in range(dice_count)]
-        total = sum(rolls) + modifier + bonus
+        result = await self.engine.evaluate(plan)
+        total = result.total + bonus
 
         # Format results
-        rolls_detailed = ', '.join(f'**{roll}**' for roll in rolls)
-        modifier_text = f" {'+' if modifier >= 0 else '-'} {abs(modifier)}" if modifier else ""
+        rolls_detailed = self.format_results(result)
 
         if bonus:
             result_message = (
-                f'🎲 You rolled: {dice_count}d{dice_sides}{modifier_text}\n'
-                f'**Results:** {rolls_detailed}\n'
-                f'**Total:** {total} (includes +{bonus} Netrunner bonus)'
+                f'🎲 You rolled: {plan.display}\n'
+                f'{rolls_detailed}\n'
+                f'**Total:** {total:,} (includes +{bonus} Netrunner bonus)'
             )
         else:
             result_message = (
-                f'🎲 You rolled: {dice_count}d{dice_sides}{modifier_text}\n'
-                f'**Results:** {rolls_detailed}\n'
-                f'**Total:** {total}'
+                f'🎲 You rolled: {plan.display}\n'
+                f'{rolls_detailed}\n'
+                f'**Total:** {total:,}'
             )
 
         # Determine logging behavior
@@ -84,22 +133,24 @@ class DiceModule(commands.Cog):
         # Send result to recipient
         if original_sender:
             dm = await author.create_dm()
-            await dm.send(result_message)
+            await self.send_chunked(dm, result_message)
 
         # Log result appropriately
         if should_log_to_dm:
             thread = await self.get_or_create_dm_thread(author)
             if original_sender:
-                await thread.send(
+                await self.send_chunked(
+                    thread,
                     f"📤 **Sent to {author.display_name} by {original_sender.display_name}:** `!roll {dice}`\n\n{result_message}"
                 )
             else:
-                await thread.send(
+                await self.send_chunked(
+                    thread,
                     f"📥 **{author.display_name} used:** `!roll {dice}`\n\n{result_message}"
                 )
         else:
             if isinstance(channel, (discord.TextChannel, discord.Thread, discord.DMChannel)):
-                await channel.send(result_message)
+                await self.send_chunked(channel, result_message)
             else:
                 print(f"[WARN] loggable_roll tried to send to unsupported channel type: {type(channel)}")
 
@@ -107,10 +158,15 @@ class DiceModule(commands.Cog):
     async def roll(self, ctx, *, dice: str):
         """
         Roll dice with optional netrunner bonuses
-        Format: !roll XdY+Z (e.g., !roll 2d6+3)
+        Format: !roll XdY+Z (e.g., !roll 2d6+1d4+3, !roll 4d6kh3, !roll 3d10!)
         """
         original_sender = getattr(ctx, "original_author", None)
 
+        # In a DM thread the relay rolls on the user's behalf, so don't also roll in the thread
+        dm_service = getattr(self.bot, "dm_service", None)
+        if not original_sender and dm_service and dm_service.get_thread_user(ctx.channel.id) is not None:
+            return
+
         # If this command was relayed into a thread (Fixer sending on behalf of bot)
         if original_sender:
             try:
@@ -1,8 +1,14 @@
 # services/economy_service.py
 # Economy and UnbelievaBoat API integration
 import aiohttp
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from discord.ext import commands
+from typing import Optional, Dict, Any, List, Sequence
 from NightCityBot.NightCityBotConfig import BotConfig
 
 logger = logging.getLogger(__name__)
@@ -10,31 +16,428 @@ logger = logging.getLogger(__name__)
 async def setup(bot):
     await bot.add_cog(EconomyCog(bot))
 
+# Methods that are safe to resend after a timeout or a dropped connection
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class UnknownOutcomeError(Exception):
+    """
+    A balance change may or may not have been applied: the request was sent
+    but no usable response came back (timeout, dropped connection or 5xx).
+    """
+
+@dataclass
+class LineItem:
+    """A single component of a combined charge."""
+    label: str
+    amount: int
+    allow_partial: bool = False
+
+
+@dataclass
+class LineItemResult:
+    """Outcome of charging a single line item."""
+    label: str
+    amount: int
+    charged: int = 0
+    cash: int = 0
+    bank: int = 0
+    status: str = "unpaid"  # paid, partial, unpaid, error or unknown
+
+
+class BalanceCache:
+    """In-process TTL/LRU cache of UnbelievaBoat balances keyed by user id."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[float, Dict[str, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, user_id: int, balance: Dict[str, Any]):
+        self._entries[user_id] = (time.monotonic() + self.ttl, dict(balance))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop one user's cached balance, or every cached balance if no user is given."""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+class TokenBucketLimiter:
+    """
+    Adaptive async token bucket shared by every outbound economy request.
+
+    Callers queue for tokens in arrival order. The refill rate is learned
+    from X-RateLimit-* response headers and halved on 429s. Every request is
+    retried on 429 or when the connection can't be opened; GETs are also
+    retried on 5xx, timeouts and dropped connections with jittered
+    exponential backoff. Other methods raise UnknownOutcomeError instead,
+    since the server may already have applied them.
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            capacity: int,
+            max_retries: int,
+            backoff_base: float,
+            backoff_max: float
+    ):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = max(rate / 32, 0.1)
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # Rate the server's headers allow for the current window, and when that window resets
+        self._header_rate: Optional[float] = None
+        self._window_resets_at = 0.0
+        # asyncio.Lock wakes waiters in FIFO order, which keeps the queue fair
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.server_errors = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait for a token."""
+        self._waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self._waiting -= 1
+
+    def update_from_headers(self, headers):
+        """Learn the server's limit and remaining budget from X-RateLimit-* headers."""
+        try:
+            limit = headers.get("X-RateLimit-Limit")
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if limit is not None:
+                self.capacity = max(int(limit), 1)
+            if remaining is None or reset is None:
+                return
+
+            remaining = int(remaining)
+            # Reset is the epoch time in milliseconds at which the window refills
+            reset_in = max(float(reset) / 1000 - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return
+
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+        self._window_resets_at = now + reset_in
+        if remaining == 0:
+            self._blocked_until = max(self._blocked_until, now + reset_in)
+            self._header_rate = self.min_rate
+        elif reset_in > 0:
+            # Spread what is left of the window evenly over the time until reset
+            self.rate = min(max(remaining / reset_in, self.min_rate), max(self.max_rate, self.capacity))
+            self._header_rate = self.rate
+
+    def penalize(self, retry_after: float):
+        """Back off every caller after a 429."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        self.tokens = 0.0
+        self._updated = now
+        self.rate = max(self.rate / 2, self.min_rate)
+        self.throttled += 1
+
+    def _recover(self):
+        """
+        Creep the rate back up after successful requests, but never past what
+        the server's headers allow until their window has reset.
+        """
+        ceiling = self.max_rate
+        if self._header_rate is not None and time.monotonic() < self._window_resets_at:
+            ceiling = min(ceiling, self._header_rate)
+        if self.rate < ceiling:
+            self.rate = min(ceiling, self.rate + self.max_rate / 20)
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    async def parse_retry_after(resp: aiohttp.ClientResponse) -> float:
+        """Get the retry delay in seconds from a 429 response."""
+        header = resp.headers.get("Retry-After")
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+
+        # UnbelievaBoat also reports retry_after in milliseconds in the body
+        try:
+            data = await resp.json(content_type=None)
+            return float(data.get("retry_after", 1000)) / 1000
+        except Exception:
+            return 1.0
+
+    async def request(
+            self,
+            session: aiohttp.ClientSession,
+            method: str,
+            url: str,
+            **kwargs
+    ) -> tuple[int, Any]:
+        """
+        Send a request once a token is available, retrying where that is safe.
+        Returns (status, body).
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.max_retries + 1):
+            await self.acquire()
+            self.requests += 1
+            last_attempt = attempt >= self.max_retries
+
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    self.update_from_headers(resp.headers)
+
+                    if resp.status == 429:
+                        retry_after = await self.parse_retry_after(resp)
+                        self.penalize(retry_after)
+                        if not last_attempt:
+                            self.retries += 1
+                            logger.warning(f"Rate limited on {method} {url}, retrying in {retry_after:.2f}s")
+                            continue
+                    elif resp.status >= 500:
+                        self.server_errors += 1
+                        if not idempotent:
+                            raise UnknownOutcomeError(f"{method} {url} returned {resp.status}")
+                        if not last_attempt:
+                            self.retries += 1
+                            await asyncio.sleep(self.backoff(attempt))
+                            continue
+                    else:
+                        self._recover()
+
+                    if resp.status == 200:
+                        return resp.status, await resp.json()
+                    return resp.status, await resp.text()
+            except aiohttp.ClientConnectorError:
+                # The connection was never opened, so nothing was sent
+                if last_attempt:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not idempotent:
+                    raise UnknownOutcomeError(f"{method} {url} failed after sending: {e!r}") from e
+                if last_attempt:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the current bucket state and counters."""
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "rate": round(self.rate, 2),
+            "blocked_for": round(max(self._blocked_until - now, 0.0), 3),
+            "waiting": self._waiting,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "server_errors": self.server_errors
+        }
+
+
 class EconomyService:
     """Service for handling economy operations through UnbelievaBoat API."""
 
-    def __init__(self, config: BotConfig):
+    def __init__(self, config: BotConfig, trace_configs: Sequence[aiohttp.TraceConfig] = ()):
         self.config = config
+        self.extra_trace_configs = list(trace_configs)
         self.headers = {
             "Authorization": config.UNBELIEVABOAT_API_TOKEN,
             "Content-Type": "application/json"
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._connections_created = 0
+        self._connections_reused = 0
+        self._queued_requests = 0
+        self._queue_wait_total = 0.0
+        self.rate_limiter = TokenBucketLimiter(
+            rate=config.ECONOMY_RATE_LIMIT,
+            capacity=config.ECONOMY_RATE_BURST,
+            max_retries=config.ECONOMY_MAX_RETRIES,
+            backoff_base=config.ECONOMY_BACKOFF_BASE,
+            backoff_max=config.ECONOMY_BACKOFF_MAX
+        )
+        self.balance_cache = BalanceCache(config.BALANCE_CACHE_TTL, config.BALANCE_CACHE_SIZE)
+
+    async def start(self):
+        """Open the pooled HTTP session used for all UnbelievaBoat calls."""
+        if self._session and not self._session.closed:
+            return
+
+        self._connector = aiohttp.TCPConnector(
+            limit=self.config.ECONOMY_POOL_LIMIT,
+            limit_per_host=self.config.ECONOMY_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=self.config.ECONOMY_DNS_CACHE_TTL,
+            keepalive_timeout=self.config.ECONOMY_KEEPALIVE_TIMEOUT
+        )
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.config.ECONOMY_REQUEST_TIMEOUT),
+            trace_configs=[self._build_trace_config(), *self.extra_trace_configs]
+        )
+        logger.info("Opened UnbelievaBoat HTTP session")
+
+    async def close(self):
+        """Close the pooled HTTP session."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info("Closed UnbelievaBoat HTTP session")
+        self._session = None
+        self._connector = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, opening it lazily if needed."""
+        if not self._session or self._session.closed:
+            await self.start()
+        return self._session
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Build trace hooks that feed the connection pool statistics."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, ctx, params):
+            self._connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self._connections_reused += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            ctx.queued_at = time.perf_counter()
+
+        async def on_connection_queued_end(session, ctx, params):
+            self._queued_requests += 1
+            self._queue_wait_total += time.perf_counter() - ctx.queued_at
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        return trace_config
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics for the UnbelievaBoat session."""
+        open_connections = 0
+        if self._connector and not self._connector.closed:
+            # aiohttp does not expose pool occupancy publicly
+            idle = getattr(self._connector, "_conns", {})
+            acquired = getattr(self._connector, "_acquired", set())
+            open_connections = len(acquired) + sum(len(conns) for conns in idle.values())
+
+        total = self._connections_created + self._connections_reused
+        return {
+            "open_connections": open_connections,
+            "connections_created": self._connections_created,
+            "connections_reused": self._connections_reused,
+            "reuse_ratio": self._connections_reused / total if total else 0.0,
+            "queued_requests": self._queued_requests,
+            "queue_wait_total": self._queue_wait_total,
+            "queue_wait_avg": self._queue_wait_total / self._queued_requests if self._queued_requests else 0.0
+        }
+
+    async def _request(self, method: str, url: str, **kwargs) -> tuple[int, Any]:
+        """
+        Send a request through the pooled session and the shared rate limiter.
+        Returns (status, body) where body is parsed JSON on 200 and text otherwise.
+        """
+        session = await self._get_session()
+        return await self.rate_limiter.request(session, method, url, **kwargs)
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        """Get the current state of the shared rate limiter."""
+        return self.rate_limiter.metrics()
+
+    def invalidate_balance(self, user_id: Optional[int] = None):
+        """Forget a cached balance, e.g. after it was changed outside the bot."""
+        self.balance_cache.invalidate(user_id)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get balance cache hit/miss statistics."""
+        return self.balance_cache.stats()
+
+    async def get_balance(self, user_id: int, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get user's balance, from the cache when fresh or else from UnbelievaBoat API."""
+        if use_cache:
+            cached = self.balance_cache.get(user_id)
+            if cached is not None:
+                return cached
 
-    async def get_balance(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Get user's balance from UnbelievaBoat API."""
         url = f"{self.config.unbelievaboat_base_url}/{user_id}"
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        logger.debug(f"Retrieved balance for user {user_id}: {data}")
-                        return data
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"Failed to get balance for {user_id}: {resp.status} - {error_text}")
-                        return None
+            status, data = await self._request("GET", url)
+            if status == 200:
+                logger.debug(f"Retrieved balance for user {user_id}: {data}")
+                self.balance_cache.set(user_id, data)
+                return data
+            else:
+                logger.error(f"Failed to get balance for {user_id}: {status} - {data}")
+                return None
         except Exception as e:
             logger.error(f"Exception getting balance for {user_id}: {e}")
             return None
@@ -45,24 +448,36 @@ class EconomyService:
             amount_dict: Dict[str, int],
             reason: str = "Automated transaction"
     ) -> bool:
-        """Update user's balance through UnbelievaBoat API."""
+        """
+        Update user's balance through UnbelievaBoat API.
+        Raises UnknownOutcomeError if the change may or may not have been applied.
+        """
         url = f"{self.config.unbelievaboat_base_url}/{user_id}"
 
         payload = amount_dict.copy()
         payload["reason"] = reason
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.patch(url, headers=self.headers, json=payload) as resp:
-                    if resp.status == 200:
-                        logger.debug(f"Updated balance for user {user_id}: {payload}")
-                        return True
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"Failed to update balance for {user_id}: {resp.status} - {error_text}")
-                        return False
+            status, data = await self._request("PATCH", url, json=payload)
+            if status == 200:
+                logger.debug(f"Updated balance for user {user_id}: {payload}")
+                # The PATCH response carries the new balance
+                if isinstance(data, dict) and "cash" in data and "bank" in data:
+                    self.balance_cache.set(user_id, data)
+                else:
+                    self.balance_cache.invalidate(user_id)
+                return True
+            else:
+                logger.error(f"Failed to update balance for {user_id}: {status} - {data}")
+                self.balance_cache.invalidate(user_id)
+                return False
+        except UnknownOutcomeError as e:
+            logger.error(f"Balance update for {user_id} may not have been applied: {e}")
+            self.balance_cache.invalidate(user_id)
+            raise
         except Exception as e:
             logger.error(f"Exception updating balance for {user_id}: {e}")
+            self.balance_cache.invalidate(user_id)
             return False
 
     async def deduct_amount(
@@ -74,6 +489,7 @@ class EconomyService:
         """
         Deduct amount from user's balance, preferring cash over bank.
         Returns (success, {cash_deducted, bank_deducted})
+        Raises UnknownOutcomeError if the deduction may or may not have been applied.
         """
         balance_data = await self.get_balance(user_id)
         if not balance_data:
@@ -106,6 +522,88 @@ class EconomyService:
         else:
             return False, {"cash": 0, "bank": 0}
 
+    async def deduct_items(
+            self,
+            user_id: int,
+            items: List[LineItem],
+            reason: str = "Billing"
+    ) -> tuple[bool, List[LineItemResult]]:
+        """
+        Charge several line items with one balance read and a single PATCH.
+        Items are settled in order, cash before bank. An item that can't be
+        covered is charged whatever is left if it allows partial payment,
+        otherwise it is left unpaid.
+        If the PATCH's outcome is unknown, the charged items keep their
+        attempted amounts and are marked "unknown" rather than retried.
+        Returns (all items paid in full, per-item results)
+        """
+        results = [LineItemResult(item.label, item.amount) for item in items]
+
+        balance_data = await self.get_balance(user_id)
+        if not balance_data:
+            for result in results:
+                result.status = "error"
+            return False, results
+
+        cash_left = max(balance_data.get("cash", 0), 0)
+        bank_left = max(balance_data.get("bank", 0), 0)
+
+        for item, result in zip(items, results):
+            available = cash_left + bank_left
+            if item.amount <= available:
+                charge = item.amount
+                result.status = "paid"
+            elif item.allow_partial and available > 0:
+                charge = available
+                result.status = "partial"
+            else:
+                continue
+
+            result.charged = charge
+            result.cash = min(cash_left, charge)
+            result.bank = charge - result.cash
+            cash_left -= result.cash
+            bank_left -= result.bank
+
+        cash_deducted = sum(result.cash for result in results)
+        bank_deducted = sum(result.bank for result in results)
+        if not cash_deducted and not bank_deducted:
+            all_free = all(result.amount == 0 for result in results)
+            if not all_free:
+                logger.warning(f"Insufficient funds for user {user_id}: nothing could be charged")
+            return all_free, results
+
+        update_payload = {}
+        if cash_deducted > 0:
+            update_payload["cash"] = -cash_deducted
+        if bank_deducted > 0:
+            update_payload["bank"] = -bank_deducted
+
+        itemized = ", ".join(self._describe_line_item(result) for result in results)
+        try:
+            success = await self.update_balance(user_id, update_payload, f"{reason}: {itemized}")
+        except UnknownOutcomeError:
+            for result in results:
+                if result.charged:
+                    result.status = "unknown"
+            return False, results
+
+        if not success:
+            for result in results:
+                result.charged = result.cash = result.bank = 0
+                result.status = "error"
+            return False, results
+
+        return all(result.status == "paid" for result in results), results
+
+    @staticmethod
+    def _describe_line_item(result: LineItemResult) -> str:
+        if result.status == "paid":
+            return f"{result.label} ${result.charged}"
+        if result.status == "partial":
+            return f"{result.label} ${result.charged} of ${result.amount}"
+        return f"{result.label} unpaid (${result.amount})"
+
     async def add_amount(
             self,
             user_id: int,
@@ -157,4 +655,23 @@ class EconomyService:
         if trauma_roles:
             # User should only have one trauma role, but take the highest cost
             return max(self.config.TRAUMA_ROLE_COSTS[role] for role in trauma_roles)
-        return 0
\ No newline at end of file
+        return 0
+
+
+class EconomyCog(commands.Cog):
+    """Cog that owns the economy service and its HTTP session lifecycle."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        api_calls = getattr(bot, "api_calls", None)
+        self.economy_service = EconomyService(
+            bot.config,
+            trace_configs=[api_calls.trace_config()] if api_calls else ()
+        )
+        bot.economy_service = self.economy_service
+
+    async def cog_load(self):
+        await self.economy_service.start()
+
+    async def cog_unload(self):
+        await self.economy_service.close()
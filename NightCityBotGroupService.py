@@ -1,10 +1,20 @@
 # group_rp.py
 # Group RP channel creation and management
 
+import asyncio
 import discord
 from discord.ext import commands
+import gzip
+import json
+import logging
+import os
 import re
-from typing import Optional, List, Mapping, Union, cast
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, List, Mapping, Union, cast
+from NightCityBot.NightCityBotChunker import pack_entries
+
+logger = logging.getLogger(__name__)
 
 
 class GroupRPModule(commands.Cog):
@@ -12,6 +22,17 @@ class GroupRPModule(commands.Cog):
         self.bot = bot
         self.GROUP_AUDIT_LOG_CHANNEL_ID = 1366880900599517214
         self.FIXER_ROLE_ID = 1379437060389339156
+        self.HISTORY_PAGE_SIZE = 100
+        self.PROGRESS_INTERVAL = 5.0
+        self.PROGRESS_PREFIX = "📝 Archiving RP session"
+        self.checkpoints: Dict[str, Dict[str, Any]] = {}
+        self.archiving = set()
+        self._checkpoint_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.checkpoints = await asyncio.to_thread(self.load_checkpoints)
+        if self.checkpoints:
+            logger.info(f"Loaded {len(self.checkpoints)} unfinished RP archive checkpoint(s)")
 
     def build_channel_name(self, usernames, max_length=100):
         """
@@ -62,50 +83,226 @@ class GroupRPModule(commands.Cog):
             reason="Creating private RP group channel"
         )
 
+    def format_log_entry(self, msg: discord.Message) -> str:
+        """Format a single RP message for the archive thread."""
+        ts = msg.created_at.strftime("%Y-%m-%d %H:%M:%S")
+        content = msg.content or "*(No text content)*"
+        entry = f"[{ts}] 📥 **Received from {msg.author.display_name}**:\n{content}"
+
+        for attachment in msg.attachments:
+            entry += f"\n📎 Attachment: {attachment.url}"
+
+        return entry
+
+    def transcript_record(self, msg: discord.Message) -> str:
+        """Format a single RP message as a JSONL transcript line."""
+        return json.dumps({
+            "id": msg.id,
+            "timestamp": msg.created_at.isoformat(),
+            "author_id": msg.author.id,
+            "author": msg.author.display_name,
+            "content": msg.content,
+            "attachments": [attachment.url for attachment in msg.attachments]
+        }) + "\n"
+
+    async def history_pages(self, channel: discord.TextChannel, after: Optional[discord.abc.Snowflake] = None):
+        """Yield the channel history oldest first, one page at a time."""
+        while True:
+            page = [
+                msg async for msg in channel.history(
+                    limit=self.HISTORY_PAGE_SIZE,
+                    after=after,
+                    oldest_first=True
+                )
+            ]
+            if not page:
+                return
+            yield page
+            after = page[-1]
+
+    def is_progress_message(self, msg: discord.Message) -> bool:
+        """Check whether a message is one of our own archive progress messages."""
+        return msg.author.id == self.bot.user.id and msg.content.startswith(self.PROGRESS_PREFIX)
+
+    def load_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        """Load archive checkpoints keyed by RP channel id."""
+        path = Path(self.bot.config.RP_ARCHIVE_CHECKPOINT_FILE)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load RP archive checkpoints: {e}")
+            return {}
+
+    def _write_checkpoints(self, data: str):
+        """Atomically replace the checkpoint file."""
+        path = self.bot.config.RP_ARCHIVE_CHECKPOINT_FILE
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to save RP archive checkpoints: {e}")
+
+    async def save_checkpoints(self):
+        """Persist the current checkpoints; saves land in the order they were requested."""
+        data = json.dumps(self.checkpoints)
+        async with self._checkpoint_lock:
+            await asyncio.to_thread(self._write_checkpoints, data)
+
+    def transcript_path(self, channel_id: int) -> Path:
+        return Path(self.bot.config.RP_TRANSCRIPT_DIR) / f"{channel_id}.jsonl.gz"
+
+    def _append_transcript(self, path: Path, records: List[str], size: int) -> int:
+        """
+        Drop anything written past the checkpointed size, then append the page
+        as its own gzip member. Returns the new transcript size.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+b") as f:
+            f.truncate(size)
+            # truncate() leaves the position at the old end of file
+            f.seek(0, os.SEEK_END)
+            if records:
+                f.write(gzip.compress("".join(records).encode()))
+                f.flush()
+                os.fsync(f.fileno())
+            return f.tell()
+
+    async def _resolve_log_thread(self, thread_id: int) -> Optional[discord.Thread]:
+        """Find the forum thread from an earlier, interrupted archive run."""
+        thread = self.bot.get_channel(thread_id)
+        if thread is None:
+            try:
+                thread = await self.bot.fetch_channel(thread_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+        return cast(discord.Thread, thread)
+
     async def end_rp_session(self, channel: discord.TextChannel):
         """
         Ends an RP session by creating a logging thread in the audit log forum channel,
-        posting the entire message history into it, and deleting the RP channel.
+        streaming the message history into it packed into as few messages as possible,
+        uploading a compressed JSONL transcript, and deleting the RP channel.
+
+        Progress is checkpointed after every page, so an interrupted archive resumes
+        where it stopped in the same thread. The channel is only deleted once the
+        archive is complete.
         """
-        log_channel = channel.guild.get_channel(self.GROUP_AUDIT_LOG_CHANNEL_ID)
-        if not isinstance(log_channel, discord.ForumChannel):
-            await channel.send("⚠️ Logging failed: audit log channel is not a ForumChannel.")
+        if channel.id in self.archiving:
+            await channel.send("⚠️ This RP session is already being archived.")
             return
 
-        # Build thread name
-        participants = channel.name.replace("text-rp-", "").split("-")
-        thread_name = "GroupRP-" + "-".join(participants)
+        self.archiving.add(channel.id)
+        try:
+            await self._archive_channel(channel)
+        finally:
+            self.archiving.discard(channel.id)
 
-        # Create forum thread
-        created = await log_channel.create_thread(
-            name=thread_name,
-            content=f"📘 RP log for `{channel.name}`"
-        )
+    async def _archive_channel(self, channel: discord.TextChannel):
+        key = str(channel.id)
+        checkpoint = self.checkpoints.get(key)
+        log_thread = None
+        if checkpoint:
+            log_thread = await self._resolve_log_thread(checkpoint["thread_id"])
+            if log_thread is None:
+                logger.warning(f"Archive thread for {channel.name} is gone, restarting the archive")
+
+        if log_thread is None:
+            log_channel = channel.guild.get_channel(self.GROUP_AUDIT_LOG_CHANNEL_ID)
+            if not isinstance(log_channel, discord.ForumChannel):
+                await channel.send("⚠️ Logging failed: audit log channel is not a ForumChannel.")
+                return
+
+            # Build thread name
+            participants = channel.name.replace("text-rp-", "").split("-")
+            thread_name = "GroupRP-" + "-".join(participants)
+
+            # Create forum thread
+            created = await log_channel.create_thread(
+                name=thread_name,
+                content=f"📘 RP log for `{channel.name}`"
+            )
+
+            # Unwrap and cast to Discord Thread
+            log_thread = created.thread if hasattr(created, "thread") else created
+            log_thread = cast(discord.Thread, log_thread)
+
+            checkpoint = {
+                "thread_id": log_thread.id,
+                "last_message_id": None,
+                "count": 0,
+                "pending": "",
+                "transcript_size": 0,
+                "complete": False
+            }
+            self.checkpoints[key] = checkpoint
+            await self.save_checkpoints()
+        elif not checkpoint["complete"]:
+            logger.info(f"Resuming archive of {channel.name} after {checkpoint['count']} messages")
 
-        # Unwrap and cast to Discord Thread
-        log_thread = created.thread if hasattr(created, "thread") else created
-        log_thread = cast(discord.Thread, log_thread)
+        transcript = self.transcript_path(channel.id)
 
-        # Log all messages into thread
-        async for msg in channel.history(limit=None, oldest_first=True):
-            ts = msg.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            content = msg.content or "*(No text content)*"
-            entry = f"[{ts}] 📥 **Received from {msg.author.display_name}**:\n{content}"
+        if not checkpoint["complete"]:
+            progress = await channel.send(f"{self.PROGRESS_PREFIX}: {checkpoint['count']} messages so far...")
+            last_progress = time.monotonic()
 
-            if msg.attachments:
-                for attachment in msg.attachments:
-                    entry += f"\n📎 Attachment: {attachment.url}"
+            after = discord.Object(checkpoint["last_message_id"]) if checkpoint["last_message_id"] else None
+            async for page in self.history_pages(channel, after):
+                last_id = page[-1].id
+                page = [msg for msg in page if not self.is_progress_message(msg)]
 
-            if len(entry) <= 2000:
-                await log_thread.send(entry)
+                checkpoint["transcript_size"] = await asyncio.to_thread(
+                    self._append_transcript,
+                    transcript,
+                    [self.transcript_record(msg) for msg in page],
+                    checkpoint["transcript_size"]
+                )
+
+                # Carry the last, partly filled message over so the next page can top it up
+                messages = list(pack_entries([checkpoint["pending"]] + [self.format_log_entry(msg) for msg in page]))
+                checkpoint["pending"] = messages.pop() if messages else ""
+                for message in messages:
+                    await log_thread.send(message)
+
+                checkpoint["last_message_id"] = last_id
+                checkpoint["count"] += len(page)
+                await self.save_checkpoints()
+
+                if time.monotonic() - last_progress >= self.PROGRESS_INTERVAL:
+                    await progress.edit(content=f"{self.PROGRESS_PREFIX}: {checkpoint['count']} messages so far...")
+                    last_progress = time.monotonic()
+
+            if checkpoint["pending"]:
+                await log_thread.send(checkpoint["pending"])
+                checkpoint["pending"] = ""
+                await self.save_checkpoints()
+
+            count = checkpoint["count"]
+            await progress.edit(content=f"{self.PROGRESS_PREFIX}: {count} messages archived, uploading transcript...")
+            if checkpoint["transcript_size"] <= channel.guild.filesize_limit:
+                await log_thread.send(
+                    f"🗜️ Full transcript ({count} messages)",
+                    file=discord.File(str(transcript), filename=f"{channel.name}-transcript.jsonl.gz")
+                )
             else:
-                chunks = [entry[i:i + 1990] for i in range(0, len(entry), 1990)]
-                for chunk in chunks:
-                    await log_thread.send(chunk)
+                await log_thread.send(f"⚠️ Transcript ({count} messages) is too large to upload.")
+
+            checkpoint["complete"] = True
+            await self.save_checkpoints()
 
         # Clean up channel
         await channel.delete(reason="RP session ended and logged.")
 
+        self.checkpoints.pop(key, None)
+        await self.save_checkpoints()
+        await asyncio.to_thread(transcript.unlink, missing_ok=True)
+
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def start_rp(self, ctx, *user_identifiers: str):
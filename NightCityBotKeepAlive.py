@@ -1,24 +1,140 @@
 # NightCityBotKeepAlive.py
+# In-loop health check and Prometheus metrics endpoint
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from aiohttp import web
+from discord.ext import commands
 
-from flask import Flask
-from threading import Thread
-
-app = Flask('')
-
-@app.route('/')
-def home():
-    return "Bot is alive!"
+logger = logging.getLogger(__name__)
 
 async def setup(bot):
     await bot.add_cog(KeepAliveCog(bot))
 
-def run():
-    app.run(host='0.0.0.0', port=5000)
 
-def keep_alive(bot, token):
-    t = Thread(target=run)
-    t.start()
-    try:
-        bot.run(token)
-    except Exception as e:
-        print(f"❌ Bot failed to start: {e}")
+class KeepAliveCog(commands.Cog):
+    """
+    Serves uptime checks from the bot's own event loop.
+
+    GET / keeps the plain "Bot is alive!" response for existing pingers,
+    GET /health reports gateway, loop and queue state as JSON (503 when
+    degraded), and GET /metrics exposes the same in Prometheus text format.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = bot.config
+        # The profiler owns the lag monitor; ProfilerCog starts and stops it
+        self.lag_monitor = bot.profiler.lag_monitor
+        self.started_at = time.time()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/", self.handle_root)
+        self.app.router.add_get("/health", self.handle_health)
+        self.app.router.add_get("/metrics", self.handle_metrics)
+
+    async def cog_load(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.config.HEALTH_HOST, self.config.HEALTH_PORT)
+        await site.start()
+        logger.info(f"Health endpoint listening on {self.config.HEALTH_HOST}:{self.config.HEALTH_PORT}")
+
+    async def cog_unload(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def heartbeat_age(self) -> Optional[float]:
+        """Seconds since the gateway last acknowledged a heartbeat, if known."""
+        # discord.py does not expose the heartbeat ack time publicly
+        keep_alive = getattr(getattr(self.bot, "ws", None), "_keep_alive", None)
+        last_ack = getattr(keep_alive, "_last_ack", None)
+        if last_ack is None:
+            return None
+        return time.perf_counter() - last_ack
+
+    def collect(self) -> Dict[str, Any]:
+        """Gather the current health snapshot."""
+        latency = self.bot.latency
+        snapshot: Dict[str, Any] = {
+            "ready": self.bot.is_ready(),
+            "closed": self.bot.is_closed(),
+            "uptime": time.time() - self.started_at,
+            "guilds": len(self.bot.guilds),
+            "gateway_latency": latency if math.isfinite(latency) else None,
+            "heartbeat_age": self.heartbeat_age(),
+            "loop_lag": self.lag_monitor.lag,
+            "loop_lag_max": self.lag_monitor.max_lag,
+            "queues": {}
+        }
+
+        dm_service = getattr(self.bot, "dm_service", None)
+        if dm_service:
+            snapshot["queues"]["dm_outbox"] = dm_service.outbox.pending_count()
+        audit_service = getattr(self.bot, "audit_service", None)
+        if audit_service:
+            snapshot["queues"]["audit"] = audit_service.pending_count()
+
+        economy_service = getattr(self.bot, "economy_service", None)
+        if economy_service:
+            snapshot["economy"] = {
+                "pool": economy_service.pool_stats(),
+                "rate_limit": economy_service.rate_limit_stats(),
+                "cache": economy_service.cache_stats()
+            }
+        return snapshot
+
+    def problems(self, snapshot: Dict[str, Any]) -> List[str]:
+        problems = []
+        if not snapshot["ready"] or snapshot["closed"]:
+            problems.append("gateway not connected")
+        if snapshot["gateway_latency"] is None:
+            problems.append("no gateway latency yet")
+        if snapshot["loop_lag"] > self.config.HEALTH_MAX_LOOP_LAG:
+            problems.append(f"event loop lag {snapshot['loop_lag']:.3f}s")
+        heartbeat_age = snapshot["heartbeat_age"]
+        if heartbeat_age is not None and heartbeat_age > self.config.HEALTH_MAX_HEARTBEAT_AGE:
+            problems.append(f"no heartbeat ack for {heartbeat_age:.0f}s")
+        return problems
+
+    async def handle_root(self, request: web.Request) -> web.Response:
+        return web.Response(text="Bot is alive!")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        snapshot = self.collect()
+        problems = self.problems(snapshot)
+        snapshot["status"] = "degraded" if problems else "ok"
+        snapshot["problems"] = problems
+        return web.json_response(snapshot, status=503 if problems else 200)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        snapshot = self.collect()
+        samples: List[Tuple[str, Any]] = [
+            ("ncbot_up", int(not self.problems(snapshot))),
+            ("ncbot_ready", int(snapshot["ready"])),
+            ("ncbot_uptime_seconds", snapshot["uptime"]),
+            ("ncbot_guilds", snapshot["guilds"]),
+            ("ncbot_gateway_latency_seconds", snapshot["gateway_latency"]),
+            ("ncbot_heartbeat_age_seconds", snapshot["heartbeat_age"]),
+            ("ncbot_event_loop_lag_seconds", snapshot["loop_lag"]),
+            ("ncbot_event_loop_lag_max_seconds", snapshot["loop_lag_max"]),
+            ("ncbot_event_loop_stalls_total", self.lag_monitor.stalls),
+        ]
+        for queue, depth in snapshot["queues"].items():
+            samples.append((f'ncbot_queue_depth{{queue="{queue}"}}', depth))
+        for group, stats in snapshot.get("economy", {}).items():
+            for key, value in stats.items():
+                samples.append((f"ncbot_economy_{group}_{key}", value))
+
+        lines = [
+            f"{name} {float(value)}"
+            for name, value in samples
+            if isinstance(value, (int, float))
+        ]
+        return web.Response(
+            body="\n".join(lines) + "\n",
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
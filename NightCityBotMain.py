@@ -18,15 +18,25 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Imports
-from NightCityBot import NightCityBotDiceService
-from NightCityBot import NightCityBotAuditService
-from NightCityBot import NightCityBotDMService
-from NightCityBot import NightCityBotEconomyService
-from NightCityBot import NightCityBotGroupService
-from NightCityBot import NightCityBotKeepAlive
-from NightCityBot import NightCityBotMessagingService
-from NightCityBot import NightCityBotPermissions
-from NightCityBot import NightCityBotConfig
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotProfiler import ApiCallTracker, Profiler
+from NightCityBot.NightCityBotStartup import StartupOrchestrator
+
+# Service modules, loaded lazily at startup. Each may declare DEPENDS_ON
+# to start after other modules; the rest start concurrently. Plain helper
+# modules (NightCityBotConfig, NightCityBotPermissions) have no cog to load.
+SERVICE_MODULES = [
+    "NightCityBot.NightCityBotProfiler",
+    "NightCityBot.NightCityBotRoleIndex",
+    "NightCityBot.NightCityBotDMService",
+    "NightCityBot.NightCityBotMessagingService",
+    "NightCityBot.NightCityBotKeepAlive",
+    "NightCityBot.NightCityBotGroupService",
+    "NightCityBot.NightCityBotDiceService",
+    "NightCityBot.NightCityBotEconomyService",
+    "NightCityBot.NightCityBotRentService",
+    "NightCityBot.NightCityBotAuditService",
+]
 
 class NCRPBot(commands.Bot):
     """Main bot class with service container and cog loading."""
@@ -38,24 +48,41 @@ class NCRPBot(commands.Bot):
         intents.members = True
         intents.dm_messages = True
 
+        # Attributes every Discord REST call to the command or listener that made it
+        api_calls = ApiCallTracker()
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None
+            help_command=None,
+            http_trace=api_calls.trace_config()
         )
+        self.api_calls = api_calls
+        self.config = BotConfig()
+        self.profiler = Profiler(self.config)
+        self.startup_report = {}
 
     async def setup_hook(self):
         """Called once bot is ready to load cogs/services."""
-        await NightCityBotMessagingService.setup(self)
-        await NightCityBotPermissions.setup(self)
-        await NightCityBotKeepAlive.setup(self)
-        await NightCityBotGroupService.setup(self)
-        await NightCityBotDiceService.setup(self)
-        await NightCityBotEconomyService.setup(self)
-        await NightCityBotDMService.setup(self)
-        await NightCityBotConfig.setup(self)
-        await NightCityBotAuditService.setup(self)
-        logger.info("✅ All cogs loaded successfully.")
+        orchestrator = StartupOrchestrator(self, SERVICE_MODULES)
+        self.startup_report = await orchestrator.run()
+        if orchestrator.failed:
+            logger.warning(f"⚠️ Some cogs failed to load: {', '.join(orchestrator.failed)}")
+        else:
+            logger.info("✅ All cogs loaded successfully.")
+
+    async def invoke(self, ctx):
+        """Time every command invocation, checks and error handling included."""
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        detail = f"{ctx.author} in {ctx.channel}: {ctx.message.content[:200]}"
+        async with self.profiler.track(f"command:{ctx.command.qualified_name}", detail):
+            await super().invoke(ctx)
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Every listener, cog or bot-level, is dispatched through here
+        name = getattr(coro, "__qualname__", event_name)
+        async with self.profiler.track(f"listener:{name}"):
+            await super()._run_event(coro, event_name, *args, **kwargs)
 
     async def on_ready(self):
         logger.info(f"🚀 Bot logged in as {self.user} ({self.user.id})")
@@ -64,4 +91,8 @@ class NCRPBot(commands.Bot):
 # Entrypoint
 if __name__ == "__main__":
     bot = NCRPBot()
-    keep_alive(bot, bot.config.TOKEN)
+    try:
+        # Logging is configured above, so keep discord.py from adding its own handler
+        bot.run(bot.config.TOKEN, log_handler=None)
+    except Exception as e:
+        logger.error(f"❌ Bot failed to start: {e}")
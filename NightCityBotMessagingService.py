@@ -1,12 +1,18 @@
 # cogs/messaging_cog.py
 # Messaging commands and DM handling
+import copy
 import discord
 from discord.ext import commands
 import logging
+from typing import Optional
 from NightCityBot.NightCityBotPermissions import is_fixer
+from NightCityBot.NightCityBotChunker import iter_chunks
 
 logger = logging.getLogger(__name__)
 
+# MessagingCog reads bot.dm_service (and its attachment pipeline) when constructed
+DEPENDS_ON = ("NightCityBot.NightCityBotDMService",)
+
 async def setup(bot):
     await bot.add_cog(MessagingCog(bot))
 
@@ -19,6 +25,64 @@ class MessagingCog(commands.Cog):
         self.config = bot.config
         # Set bot reference in services
         bot.dm_service.set_bot(bot)
+        # Shared with DM relays so the download cap is process-wide
+        self.attachments = bot.dm_service.attachments
+
+    async def _resolve_destination(self, ctx, destination: str) -> Optional[discord.abc.Messageable]:
+        """Resolve a channel/thread mention, id or name in the guild."""
+        guild = ctx.guild or self.bot.get_guild(self.config.GUILD_ID)
+        if guild is None:
+            return None
+
+        raw = destination.strip()
+        if raw.startswith("<#") and raw.endswith(">"):
+            raw = raw[2:-1]
+
+        if raw.isdigit():
+            channel = guild.get_channel_or_thread(int(raw))
+            if channel is None:
+                # Archived threads aren't in the gateway cache
+                try:
+                    channel = await guild.fetch_channel(int(raw))
+                except discord.HTTPException:
+                    return None
+            return channel if isinstance(channel, discord.abc.Messageable) else None
+
+        name = raw.lstrip("#").lower()
+        for channel in [*guild.text_channels, *guild.threads]:
+            if channel.name.lower() == name:
+                return channel
+        return None
+
+    async def _execute_command_in_channel(self, ctx, channel, command: str):
+        """Invoke a command as if the author had sent it in the given channel."""
+        message = copy.copy(ctx.message)
+        message.channel = channel
+        message.content = command
+        new_ctx = await self.bot.get_context(message)
+        if new_ctx.command is None:
+            raise commands.CommandNotFound(f'Command "{new_ctx.invoked_with}" is not found')
+        await self.bot.invoke(new_ctx)
+
+    async def _send_roll_dm(self, ctx, user: discord.User, dice: str):
+        """Roll on the user's behalf; the dice cog DMs them the result and logs it to their thread."""
+        dice_cog = self.bot.get_cog("DiceModule")
+        if dice_cog is None:
+            await ctx.send("❌ Dice rolling is not available.")
+            return
+
+        try:
+            # Expression errors are reported back here rather than to the user
+            await dice_cog.loggable_roll(user, ctx.channel, dice, original_sender=ctx.author)
+            await self.bot.audit_service.log_audit(
+                ctx.author,
+                f"Rolled {dice} for {user}",
+                "dm_roll",
+                str(user.id)
+            )
+        except Exception as e:
+            logger.error(f"Failed to send roll DM: {e}")
+            await ctx.send("❌ Failed to send roll.")
 
     @commands.command()
     @is_fixer()
@@ -32,9 +96,7 @@ class MessagingCog(commands.Cog):
             await ctx.send(f"❌ Couldn't find channel/thread '{destination}'.")
             return
 
-        files = [await attachment.to_file() for attachment in ctx.message.attachments]
-
-        if not message and not files:
+        if not message and not ctx.message.attachments:
             await ctx.send("❌ Provide a message or attachment.")
             return
 
@@ -45,13 +107,24 @@ class MessagingCog(commands.Cog):
                 await ctx.send(f"✅ Executed `{message.strip()}` in {dest_channel.mention}.")
             else:
                 # Send regular message
-                await dest_channel.send(content=message, files=files)
+                size_limit = getattr(getattr(dest_channel, "guild", None), "filesize_limit",
+                                     discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES)
+                prepared = await self.attachments.prepare(ctx.message.attachments, size_limit)
+                try:
+                    chunks = list(iter_chunks(prepared.content_with_links(message) or "")) or [None]
+                    for chunk in chunks[:-1]:
+                        await dest_channel.send(content=chunk)
+                    await dest_channel.send(content=chunks[-1], files=prepared.files)
+                finally:
+                    prepared.close()
                 await ctx.send(f"✅ Posted anonymously to {dest_channel.mention}.")
 
                 # Log the action
                 await self.bot.audit_service.log_audit(
                     ctx.author,
-                    f"Posted message to {dest_channel.name}: {message[:50]}..."
+                    f"Posted message to {dest_channel.name}: {(message or '')[:50]}...",
+                    "post",
+                    dest_channel.name
                 )
 
         except Exception as e:
@@ -66,7 +139,8 @@ class MessagingCog(commands.Cog):
             await ctx.send("❌ Could not resolve user.")
             await self.bot.audit_service.log_audit(
                 ctx.author,
-                "❌ Failed DM: Could not resolve user"
+                "❌ Failed DM: Could not resolve user",
+                "dm_failed"
             )
             return
 
@@ -93,5 +167,19 @@ class MessagingCog(commands.Cog):
 
         try:
             # Send the DM
-            await user.send(content=dm_content)
-            await ctx.send(f'✅ DM sent anonymously to {user.display_name
\ No newline at end of file
+            for chunk in iter_chunks(dm_content):
+                await user.send(content=chunk)
+            await ctx.send(f'✅ DM sent anonymously to {user.display_name}.')
+
+            # Log the DM
+            await self.bot.dm_service.log_outgoing_dm(user, dm_content, ctx.author.display_name)
+            await self.bot.audit_service.log_audit(
+                ctx.author,
+                f"Sent DM to {user}: {dm_content[:50]}...",
+                "dm",
+                str(user.id)
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to send DM: {e}")
+            await ctx.send("❌ Failed to send DM.")
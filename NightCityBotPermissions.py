@@ -2,7 +2,6 @@
 
 import discord
 from discord.ext import commands
-from NightCityBot.NightCityBotConfig import FIXER_ROLE_NAME
 
 async def setup(bot):
     await bot.add_cog(PermissionsCog(bot))
@@ -10,6 +9,6 @@ async def setup(bot):
 def is_fixer():
     async def predicate(ctx):
         if isinstance(ctx.author, discord.Member):
-            return discord.utils.get(ctx.author.roles, name=FIXER_ROLE_NAME) is not None
+            return ctx.bot.role_index.has_category(ctx.author, "fixer")
         return False
     return commands.check(predicate)
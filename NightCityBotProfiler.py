@@ -0,0 +1,333 @@
+# NightCityBotProfiler.py
+# Event loop lag monitor, per-command/listener latency profiling and HTTP call accounting
+import asyncio
+import bisect
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import aiohttp
+from discord.ext import commands
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotPermissions import is_fixer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds; the last bucket is open-ended
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Name of the command or listener currently being tracked; HTTP calls made
+# while it runs (including from tasks it spawns) are attributed to it
+current_handler: ContextVar[Optional[str]] = ContextVar("current_handler", default=None)
+
+_SNOWFLAKE = re.compile(r"/\d{15,}")
+_WEBHOOK_TOKEN = re.compile(r"(/(?:webhooks|interactions)/\{id\}/)[^/]+")
+
+async def setup(bot):
+    await bot.add_cog(ProfilerCog(bot))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the given percentile, capped at the max seen."""
+        target = self.count * pct / 100
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if hits and seen >= target:
+                return min(LATENCY_BUCKETS[index], self.max) if index < len(LATENCY_BUCKETS) else self.max
+        return 0.0
+
+
+class LoopLagMonitor:
+    """
+    Samples event loop lag: how late a sleep of `interval` seconds wakes up.
+    Calls on_stall(lag, since) when the lag passes warn_threshold.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_threshold: Optional[float] = None, on_stall=None):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.on_stall = on_stall
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.histogram = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.histogram.observe(self.lag)
+            if self.warn_threshold is not None and self.lag > self.warn_threshold:
+                self.stalls += 1
+                if self.on_stall:
+                    self.on_stall(self.lag, started)
+
+
+class Profiler:
+    """
+    Times every command and event listener the bot runs.
+
+    Each handler name gets a latency histogram. Handlers slower than
+    PROFILER_SLOW_THRESHOLD are logged with their details, and when the
+    lag monitor sees the loop stall, the handlers that were running around
+    that time are logged as suspects.
+    """
+
+    def __init__(self, config: BotConfig):
+        self.config = config
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.slow_calls = 0
+        self._in_flight: Dict[int, Tuple[str, str, float]] = {}
+        self._recent: Deque[Tuple[float, str, str]] = deque(maxlen=50)
+        self._next_id = 0
+        self.lag_monitor = LoopLagMonitor(
+            config.LOOP_LAG_INTERVAL,
+            config.LOOP_LAG_WARN,
+            self._log_stall
+        )
+
+    @asynccontextmanager
+    async def track(self, name: str, detail: str = ""):
+        """Time the wrapped handler under the given name."""
+        call_id = self._next_id
+        self._next_id += 1
+        started = time.perf_counter()
+        self._in_flight[call_id] = (name, detail, started)
+        token = current_handler.set(name)
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            current_handler.reset(token)
+            del self._in_flight[call_id]
+            self._recent.append((finished, name, detail))
+            self.record(name, finished - started, detail)
+
+    def record(self, name: str, seconds: float, detail: str = ""):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+        if seconds > self.config.PROFILER_SLOW_THRESHOLD:
+            self.slow_calls += 1
+            logger.warning(f"Slow handler {name} took {seconds * 1000:.0f}ms" + (f": {detail}" if detail else ""))
+
+    def _log_stall(self, lag: float, since: float):
+        suspects = [f"{name} (running)" for name, _, _ in self._in_flight.values()]
+        suspects += [name for finished, name, _ in self._recent if finished >= since]
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f}ms; "
+            f"handlers active meanwhile: {', '.join(dict.fromkeys(suspects)) or 'none tracked'}"
+        )
+
+    def top(self, limit: int = 10, match: str = "") -> List[Tuple[str, LatencyHistogram]]:
+        """Get the handlers with the highest p95 latency, optionally filtered by name."""
+        rows = [(name, histogram) for name, histogram in self.histograms.items() if match in name]
+        rows.sort(key=lambda row: (row[1].percentile(95), row[1].max), reverse=True)
+        return rows[:limit]
+
+
+@dataclass
+class ApiCallStats:
+    calls: int = 0
+    errors: int = 0
+    rate_limited: int = 0  # 429 responses
+    exhausted: int = 0  # Responses that used up the last request in their bucket
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    wall_time: float = 0.0
+    endpoints: Counter = field(default_factory=Counter)
+
+
+class ApiCallTracker:
+    """
+    Counts and times outbound HTTP calls through aiohttp trace hooks.
+
+    Each call is attributed to the handler in current_handler, or to
+    "background" (plus the task name, if it has one) when none is running.
+    Responses that hit a rate limit are counted per handler and logged.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, ApiCallStats] = {}
+
+    @staticmethod
+    def attribution() -> str:
+        handler = current_handler.get()
+        if handler:
+            return handler
+        task = asyncio.current_task()
+        task_name = task.get_name() if task else ""
+        return f"background:{task_name}" if task_name and not task_name.startswith("Task-") else "background"
+
+    @staticmethod
+    def endpoint(method: str, url) -> str:
+        """Collapse IDs and tokens in the path so calls group by route."""
+        path = _WEBHOOK_TOKEN.sub(r"\1{token}", _SNOWFLAKE.sub("/{id}", url.path))
+        return f"{method} {url.host}{path}"
+
+    def _stats_for(self, handler: str) -> ApiCallStats:
+        stats = self.stats.get(handler)
+        if stats is None:
+            stats = self.stats[handler] = ApiCallStats()
+        return stats
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Build trace hooks for a client session; one tracker can feed several sessions."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+            ctx.stats = self._stats_for(self.attribution())
+            ctx.endpoint = self.endpoint(params.method, params.url)
+            ctx.stats.calls += 1
+            ctx.stats.endpoints[ctx.endpoint] += 1
+
+        async def on_request_chunk_sent(session, ctx, params):
+            ctx.stats.bytes_sent += len(params.chunk)
+
+        async def on_response_chunk_received(session, ctx, params):
+            ctx.stats.bytes_received += len(params.chunk)
+
+        async def on_request_end(session, ctx, params):
+            ctx.stats.wall_time += time.perf_counter() - ctx.started
+            response = params.response
+            if response.status == 429:
+                ctx.stats.rate_limited += 1
+                logger.warning(
+                    f"Rate limited on {ctx.endpoint} during {self.attribution()} "
+                    f"(retry after {response.headers.get('Retry-After', '?')}s, "
+                    f"scope {response.headers.get('X-RateLimit-Scope', 'unknown')})"
+                )
+            elif response.headers.get("X-RateLimit-Remaining") == "0":
+                ctx.stats.exhausted += 1
+
+        async def on_request_exception(session, ctx, params):
+            ctx.stats.wall_time += time.perf_counter() - ctx.started
+            ctx.stats.errors += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def top(self, limit: int = 10, match: str = "") -> List[Tuple[str, ApiCallStats]]:
+        """Get the handlers making the most calls, optionally filtered by name."""
+        rows = [(name, stats) for name, stats in self.stats.items() if match in name]
+        rows.sort(key=lambda row: (row[1].calls, row[1].wall_time), reverse=True)
+        return rows[:limit]
+
+
+class ProfilerCog(commands.Cog):
+    """Runs the bot's lag monitor and exposes the profiler and API call stats to fixers."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.profiler: Profiler = bot.profiler
+        self.api_calls: ApiCallTracker = bot.api_calls
+
+    async def cog_load(self):
+        self.profiler.lag_monitor.start()
+
+    async def cog_unload(self):
+        await self.profiler.lag_monitor.stop()
+
+    @commands.command()
+    @is_fixer()
+    async def perf(self, ctx, match: str = ""):
+        """
+        Show the slowest commands and listeners by p95 latency.
+        Usage: !perf [name filter], e.g. !perf command:
+        """
+        rows = self.profiler.top(self.bot.config.PROFILER_REPORT_ROWS, match)
+        monitor = self.profiler.lag_monitor
+        lines = [
+            f"loop lag now {monitor.lag * 1000:.1f}ms, p95 {monitor.histogram.percentile(95) * 1000:.0f}ms, "
+            f"max {monitor.max_lag * 1000:.0f}ms, stalls {monitor.stalls}, slow handlers {self.profiler.slow_calls}",
+            "",
+            f"{'handler':<44} {'calls':>6} {'mean':>8} {'p50':>7} {'p95':>7} {'max':>8}"
+        ]
+        for name, histogram in rows:
+            lines.append(
+                f"{name[:44]:<44} {histogram.count:>6} {histogram.mean * 1000:>6.0f}ms "
+                f"{histogram.percentile(50) * 1000:>5.0f}ms {histogram.percentile(95) * 1000:>5.0f}ms "
+                f"{histogram.max * 1000:>6.0f}ms"
+            )
+        if not rows:
+            lines.append("(no handlers recorded yet)")
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @commands.command()
+    @is_fixer()
+    async def apistats(self, ctx, match: str = ""):
+        """
+        Show outbound HTTP calls per command/listener: calls, bytes, wall time and rate limits.
+        Usage: !apistats [name filter]; with a filter, the busiest endpoints are listed too.
+        """
+        rows = self.api_calls.top(self.bot.config.PROFILER_REPORT_ROWS, match)
+        lines = [f"{'handler':<40} {'calls':>6} {'/run':>5} {'sent':>8} {'recv':>8} {'wall':>8} {'429':>4} {'0left':>5}"]
+        for name, stats in rows:
+            histogram = self.profiler.histograms.get(name)
+            per_run = f"{stats.calls / histogram.count:.1f}" if histogram and histogram.count else "-"
+            lines.append(
+                f"{name[:40]:<40} {stats.calls:>6} {per_run:>5} {format_bytes(stats.bytes_sent):>8} "
+                f"{format_bytes(stats.bytes_received):>8} {stats.wall_time * 1000:>6.0f}ms "
+                f"{stats.rate_limited:>4} {stats.exhausted:>5}"
+            )
+            if match:
+                for endpoint, calls in stats.endpoints.most_common(3):
+                    lines.append(f"    {calls:>6}  {endpoint[:70]}")
+        if not rows:
+            lines.append("(no HTTP calls recorded yet)")
+        await ctx.send("```\n" + "\n".join(lines)[:1900] + "\n```")
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
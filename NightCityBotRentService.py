@@ -0,0 +1,431 @@
+# NightCityBotRentService.py
+# Bulk monthly rent and billing runs
+import asyncio
+import discord
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from discord.ext import commands
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotEconomyService import EconomyService, LineItem
+
+logger = logging.getLogger(__name__)
+
+# RentCog needs bot.economy_service when constructed
+DEPENDS_ON = ("NightCityBot.NightCityBotEconomyService",)
+
+async def setup(bot):
+    await bot.add_cog(RentCog(bot))
+
+
+@dataclass
+class MemberBill:
+    """Monthly bill for a single member."""
+    user_id: int
+    display_name: str
+    housing: int = 0
+    business: int = 0
+    trauma: int = 0
+    flat_fee: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.housing + self.business + self.trauma + self.flat_fee
+
+    def line_items(self) -> List[LineItem]:
+        """Get the non-zero components of the bill as line items."""
+        components = [
+            ("Housing", self.housing),
+            ("Business", self.business),
+            ("Trauma Team", self.trauma),
+            ("Monthly fee", self.flat_fee)
+        ]
+        return [LineItem(label, amount) for label, amount in components if amount]
+
+
+@dataclass
+class RentRunSummary:
+    """Outcome of a bulk rent run."""
+    billed: int = 0
+    charged: int = 0
+    resumed: int = 0
+    collected: int = 0
+    elapsed: float = 0.0
+    failures: List[Tuple[MemberBill, str]] = field(default_factory=list)
+    # Members whose charge may or may not have gone through, with the amount attempted
+    unknown: List[Tuple[MemberBill, int]] = field(default_factory=list)
+
+
+class RentJournal:
+    """
+    Append-only per-member progress journal for a rent run.
+
+    Each record is flushed to the OS as soon as it is written, so a process
+    crash loses nothing; fsync is batched to bound the cost of durability.
+    """
+
+    def __init__(self, path: str, fsync_batch: int, fsync_interval: float):
+        self.path = Path(path)
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = 0.0
+        self._syncing = False
+
+    def load(self, run_id: str) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """
+        Get ({user_id: amount} charged, {user_id: amount} with an unknown
+        outcome) for the given run. Neither should be charged again.
+
+        An "attempt" with no later outcome was in flight when the process
+        died, so it may or may not have been applied: it counts as unknown.
+        """
+        latest: Dict[int, Tuple[str, int]] = {}
+        if not self.path.exists():
+            return {}, {}
+
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if record.get("run") != run_id:
+                    continue
+                latest[int(record["user"])] = (record.get("status"), int(record.get("amount", 0)))
+
+        charged = {user_id: amount for user_id, (status, amount) in latest.items() if status == "charged"}
+        unknown = {
+            user_id: amount for user_id, (status, amount) in latest.items()
+            if status in ("unknown", "attempt")
+        }
+        return charged, unknown
+
+    def open(self):
+        torn = False
+        if self.path.exists() and self.path.stat().st_size:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+
+        self._file = open(self.path, "a")
+        if torn:
+            # End the torn line so records appended on resume stay parseable
+            self._file.write("\n")
+        self._last_sync = time.monotonic()
+
+    async def record(self, run_id: str, user_id: int, status: str, amount: int):
+        """Append a member's outcome to the journal."""
+        line = json.dumps({"run": run_id, "user": user_id, "status": status, "amount": amount})
+        self._file.write(line + "\n")
+        self._file.flush()
+        self._unsynced += 1
+
+        due = (
+            self._unsynced >= self.fsync_batch
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        )
+        if due and not self._syncing:
+            await self._sync()
+
+    async def _sync(self):
+        self._syncing = True
+        try:
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+        finally:
+            self._syncing = False
+
+    async def close(self):
+        if self._file:
+            await self._sync()
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """Drop the journal once a run has completed."""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RentService:
+    """Service that bills the whole guild through a bounded worker pool."""
+
+    def __init__(self, bot, config: BotConfig, economy_service: EconomyService):
+        self.bot = bot
+        self.config = config
+        self.economy_service = economy_service
+        self._run_lock = asyncio.Lock()
+        self.journal = RentJournal(
+            config.RENT_JOURNAL_FILE,
+            config.RENT_JOURNAL_FSYNC_BATCH,
+            config.RENT_JOURNAL_FSYNC_INTERVAL
+        )
+
+        # Flatten the cost tables once: role name -> (component, cost)
+        self._price_table: Dict[str, Tuple[str, int]] = {}
+        for component, costs in (
+                ("housing", config.HOUSING_ROLE_COSTS),
+                ("business", config.BUSINESS_ROLE_COSTS),
+                ("trauma", config.TRAUMA_ROLE_COSTS)
+        ):
+            for role_name, cost in costs.items():
+                self._price_table[role_name] = (component, cost)
+
+    @property
+    def is_running(self) -> bool:
+        return self._run_lock.locked()
+
+    def snapshot_members(self, guild: discord.Guild) -> List[Tuple[int, str, frozenset]]:
+        """Take an immutable snapshot of every human member and their role names."""
+        return [
+            (member.id, member.display_name, frozenset(role.name for role in member.roles))
+            for member in guild.members
+            if not member.bot
+        ]
+
+    def compute_bills(self, snapshot: Iterable[Tuple[int, str, frozenset]]) -> List[MemberBill]:
+        """
+        Compute every member's bill in a single pass over their role sets.
+        Members without any billable role are not billed.
+        """
+        price_table = self._price_table
+        bills = []
+
+        for user_id, display_name, role_names in snapshot:
+            billable = role_names & price_table.keys()
+            if not billable:
+                continue
+
+            bill = MemberBill(user_id, display_name, flat_fee=self.config.FLAT_MONTHLY_FEE)
+            for role_name in billable:
+                component, cost = price_table[role_name]
+                if component == "trauma":
+                    # Only the highest trauma subscription is charged
+                    bill.trauma = max(bill.trauma, cost)
+                elif component == "housing":
+                    bill.housing += cost
+                else:
+                    bill.business += cost
+            bills.append(bill)
+
+        return bills
+
+    async def collect_rent(self, guild: discord.Guild) -> RentRunSummary:
+        """
+        Bill every member of the guild and post a run summary.
+        If the previous run was interrupted it is resumed, skipping members
+        the journal already records as charged or with an unknown outcome.
+        """
+        if self.is_running:
+            raise RuntimeError("A rent run is already in progress")
+
+        async with self._run_lock:
+            started = time.perf_counter()
+            last_rent = self._load_last_rent()
+
+            if last_rent and last_rent.get("status") == "in_progress":
+                run_id = last_rent["run_id"]
+                already_charged, already_unknown = self.journal.load(run_id)
+                logger.info(
+                    f"Resuming rent run {run_id}, {len(already_charged)} members already charged, "
+                    f"{len(already_unknown)} with an unknown outcome"
+                )
+            else:
+                run_id = uuid.uuid4().hex
+                already_charged, already_unknown = {}, {}
+                self.journal.clear()
+                self._save_last_rent({
+                    "run_id": run_id,
+                    "status": "in_progress",
+                    "started_at": datetime.now(timezone.utc).isoformat()
+                })
+
+            bills = self.compute_bills(self.snapshot_members(guild))
+            summary = RentRunSummary(
+                billed=len(bills),
+                resumed=len(already_charged),
+                charged=len(already_charged),
+                collected=sum(already_charged.values())
+            )
+            summary.unknown = [
+                (bill, already_unknown[bill.user_id]) for bill in bills if bill.user_id in already_unknown
+            ]
+            pending = [
+                bill for bill in bills
+                if bill.user_id not in already_charged and bill.user_id not in already_unknown
+            ]
+            logger.info(f"Starting rent run {run_id} for {len(pending)} members")
+
+            queue: asyncio.Queue = asyncio.Queue()
+            for bill in pending:
+                queue.put_nowait(bill)
+
+            self.journal.open()
+            workers = [
+                asyncio.create_task(self._worker(queue, summary, run_id))
+                for _ in range(max(1, self.config.RENT_CONCURRENCY))
+            ]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await self.journal.close()
+
+            summary.elapsed = time.perf_counter() - started
+            self._save_last_rent({
+                "run_id": run_id,
+                "status": "complete",
+                "last_run": datetime.now(timezone.utc).isoformat(),
+                "billed": summary.billed,
+                "charged": summary.charged,
+                "collected": summary.collected,
+                "unknown": [bill.user_id for bill, _ in summary.unknown]
+            })
+            self.journal.clear()
+
+            await self._post_summary(summary)
+            logger.info(
+                f"Rent run finished: {summary.charged}/{summary.billed} charged, "
+                f"${summary.collected} collected in {summary.elapsed:.1f}s"
+            )
+            return summary
+
+    async def _worker(self, queue: asyncio.Queue, summary: RentRunSummary, run_id: str):
+        """Drain bills from the queue, charge them and journal the outcome."""
+        while True:
+            bill = await queue.get()
+            try:
+                # Journalled before the PATCHes go out so a crash mid-charge
+                # leaves the member flagged instead of charged twice on resume
+                await self.journal.record(run_id, bill.user_id, "attempt", bill.total)
+                success, results = await self.economy_service.deduct_items(
+                    bill.user_id,
+                    bill.line_items(),
+                    reason="Monthly rent"
+                )
+                if any(result.status == "unknown" for result in results):
+                    # Never retried: the member may already have paid
+                    attempted = sum(result.charged for result in results)
+                    await self.journal.record(run_id, bill.user_id, "unknown", attempted)
+                    summary.unknown.append((bill, attempted))
+                    continue
+
+                charged = sum(result.charged for result in results)
+                if charged:
+                    await self.journal.record(run_id, bill.user_id, "charged", charged)
+                    summary.charged += 1
+                    summary.collected += charged
+                else:
+                    await self.journal.record(run_id, bill.user_id, "failed", 0)
+
+                if not success:
+                    if any(result.status == "error" for result in results):
+                        reason = "API error"
+                    else:
+                        unpaid = [result.label for result in results if result.status != "paid"]
+                        reason = "unpaid: " + ", ".join(unpaid)
+                    summary.failures.append((bill, reason))
+            except Exception as e:
+                logger.error(f"Rent charge failed for {bill.user_id}: {e}")
+                summary.failures.append((bill, str(e)))
+            finally:
+                queue.task_done()
+
+    def _load_last_rent(self) -> Optional[Dict[str, Any]]:
+        """Load the last rent run record, if any."""
+        path = Path(self.config.LAST_RENT_FILE)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load last rent file: {e}")
+            return None
+
+    def _save_last_rent(self, record: Dict[str, Any]):
+        """Atomically replace the last rent run record."""
+        tmp_path = f"{self.config.LAST_RENT_FILE}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(record, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config.LAST_RENT_FILE)
+        except Exception as e:
+            logger.error(f"Failed to save last rent file: {e}")
+
+    async def _post_summary(self, summary: RentRunSummary):
+        """Post the run summary to the rent log channel."""
+        rent_channel = self.bot.get_channel(self.config.RENT_LOG_CHANNEL_ID)
+        if not isinstance(rent_channel, discord.TextChannel):
+            logger.warning(f"Rent log channel {self.config.RENT_LOG_CHANNEL_ID} is not a TextChannel")
+            return
+
+        embed = discord.Embed(title="🏠 Rent Collection", color=discord.Color.gold())
+        embed.add_field(name="Members billed", value=str(summary.billed))
+        embed.add_field(name="Charged", value=str(summary.charged))
+        if summary.resumed:
+            embed.add_field(name="Resumed", value=f"{summary.resumed} already charged")
+        embed.add_field(name="Collected", value=f"${summary.collected}")
+        embed.add_field(name="Duration", value=f"{summary.elapsed:.1f}s")
+
+        if summary.failures:
+            lines = [f"<@{bill.user_id}> ${bill.total}: {reason}" for bill, reason in summary.failures[:20]]
+            if len(summary.failures) > 20:
+                lines.append(f"...and {len(summary.failures) - 20} more")
+            embed.add_field(name=f"Failed ({len(summary.failures)})", value="\n".join(lines)[:1024], inline=False)
+
+        if summary.unknown:
+            lines = [f"<@{bill.user_id}> ${amount}" for bill, amount in summary.unknown[:20]]
+            if len(summary.unknown) > 20:
+                lines.append(f"...and {len(summary.unknown) - 20} more")
+            embed.add_field(
+                name=f"Check manually ({len(summary.unknown)}), charge may have gone through",
+                value="\n".join(lines)[:1024],
+                inline=False
+            )
+
+        await rent_channel.send(embed=embed)
+
+
+class RentCog(commands.Cog):
+    """Cog exposing bulk rent collection."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.rent_service = RentService(bot, bot.config, bot.economy_service)
+        bot.rent_service = self.rent_service
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def collect_rent(self, ctx):
+        """
+        Bill every member for housing, business, trauma and the flat monthly fee.
+        Resumes the previous run if it was interrupted.
+        """
+        if self.rent_service.is_running:
+            await ctx.send("⚠️ A rent run is already in progress.")
+            return
+
+        await ctx.send("🏠 Collecting rent for the whole guild...")
+        summary = await self.rent_service.collect_rent(ctx.guild)
+        await ctx.send(
+            f"✅ Rent run finished: {summary.charged}/{summary.billed} charged, "
+            f"${summary.collected} collected, {len(summary.failures)} failed"
+            + (f", {len(summary.unknown)} need a manual check." if summary.unknown else ".")
+        )
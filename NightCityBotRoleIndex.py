@@ -0,0 +1,140 @@
+# NightCityBotRoleIndex.py
+# Role-name to role-id index for fast membership and bonus checks
+import discord
+import logging
+from discord.ext import commands
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set
+from NightCityBot.NightCityBotConfig import BotConfig
+
+logger = logging.getLogger(__name__)
+
+async def setup(bot):
+    await bot.add_cog(RoleIndexCog(bot))
+
+
+def member_role_ids(member) -> Iterable[int]:
+    """
+    Get a member's role ids without building Role objects.
+    Member.roles looks up and sorts every Role on each access; Member._roles
+    already holds the raw ids.
+    """
+    role_ids = getattr(member, "_roles", None)
+    if role_ids is not None:
+        return role_ids
+    return [role.id for role in getattr(member, "roles", ())]
+
+
+class RoleIndex:
+    """
+    Resolves the configured role names to ids once per guild and answers
+    membership questions with set intersections on role ids.
+
+    Categories map configured role names to a value (cost or bonus). The
+    index is kept current by the role create/update/delete listeners in
+    RoleIndexCog. Until the guild has been indexed, checks fall back to
+    comparing role names.
+    """
+
+    def __init__(self, config: BotConfig):
+        self.config = config
+        self.categories: Dict[str, Mapping[str, int]] = {
+            "fixer": {config.FIXER_ROLE_NAME: 0},
+            "housing": config.HOUSING_ROLE_COSTS,
+            "business": config.BUSINESS_ROLE_COSTS,
+            "trauma": config.TRAUMA_ROLE_COSTS,
+            "netrunner": config.NETRUNNER_BONUSES
+        }
+        self._names: Set[str] = {name for table in self.categories.values() for name in table}
+        self._role_names: Dict[int, str] = {}
+        self._category_ids: Dict[str, FrozenSet[int]] = {}
+        self._values: Dict[str, Dict[int, int]] = {}
+        self.ready = False
+
+    def rebuild(self, guild: discord.Guild):
+        """Index every configured role in the guild."""
+        self._role_names = {role.id: role.name for role in guild.roles if role.name in self._names}
+        self._recompute()
+        self.ready = True
+        logger.info(f"Indexed {len(self._role_names)} configured roles in {guild.name}")
+
+    def role_changed(self, role: discord.Role):
+        """Update the index after a role is created or renamed."""
+        tracked = role.id in self._role_names
+        if role.name in self._names:
+            self._role_names[role.id] = role.name
+        elif tracked:
+            del self._role_names[role.id]
+        else:
+            return
+        self._recompute()
+
+    def role_deleted(self, role: discord.Role):
+        if self._role_names.pop(role.id, None) is not None:
+            self._recompute()
+
+    def _recompute(self):
+        self._values = {
+            category: {role_id: table[name] for role_id, name in self._role_names.items() if name in table}
+            for category, table in self.categories.items()
+        }
+        self._category_ids = {category: frozenset(values) for category, values in self._values.items()}
+
+    def matching_ids(self, member, category: str) -> FrozenSet[int]:
+        """Get the ids of the member's roles that belong to a category."""
+        if not self.ready:
+            table = self.categories[category]
+            return frozenset(role.id for role in getattr(member, "roles", ()) if role.name in table)
+        return self._category_ids[category].intersection(member_role_ids(member))
+
+    def has_category(self, member, category: str) -> bool:
+        return bool(self.matching_ids(member, category))
+
+    def role_names(self, member, category: str) -> List[str]:
+        """Get the names of the member's roles in a category."""
+        if not self.ready:
+            table = self.categories[category]
+            return [role.name for role in getattr(member, "roles", ()) if role.name in table]
+        return [self._role_names[role_id] for role_id in self.matching_ids(member, category)]
+
+    def values(self, member, category: str) -> List[int]:
+        """Get the configured values (costs or bonuses) of the member's roles in a category."""
+        if not self.ready:
+            table = self.categories[category]
+            return [table[name] for name in self.role_names(member, category)]
+        values = self._values[category]
+        return [values[role_id] for role_id in self.matching_ids(member, category)]
+
+    def best_value(self, member, category: str, default: int = 0) -> int:
+        return max(self.values(member, category), default=default)
+
+
+class RoleIndexCog(commands.Cog):
+    """Cog that owns the role index and keeps it in sync with role events."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.role_index = RoleIndex(bot.config)
+        bot.role_index = self.role_index
+
+    def _is_home_guild(self, guild: Optional[discord.Guild]) -> bool:
+        return guild is not None and guild.id == self.bot.config.GUILD_ID
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        if self._is_home_guild(guild):
+            self.role_index.rebuild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        if self._is_home_guild(role.guild):
+            self.role_index.role_changed(role)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if self._is_home_guild(after.guild) and before.name != after.name:
+            self.role_index.role_changed(after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if self._is_home_guild(role.guild):
+            self.role_index.role_deleted(role)
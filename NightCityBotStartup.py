@@ -0,0 +1,133 @@
+# NightCityBotStartup.py
+# Dependency-aware, concurrent cog/service startup with a timing report
+import asyncio
+import importlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupPhase:
+    module: str
+    depends_on: Sequence[str] = ()
+    import_ms: float = 0.0
+    wait_ms: float = 0.0
+    setup_ms: float = 0.0
+    status: str = "pending"
+    error: Optional[str] = None
+
+
+class StartupOrchestrator:
+    """
+    Loads service modules and runs their setup() concurrently.
+
+    Modules are imported lazily in worker threads. Each module may declare
+    DEPENDS_ON, a tuple of module names whose setup() must finish before its
+    own starts; everything else starts at once. A module whose import or
+    setup fails is reported, and modules depending on it are skipped.
+    """
+
+    def __init__(self, bot, modules: Sequence[str]):
+        self.bot = bot
+        self.modules = list(modules)
+        self.phases: Dict[str, StartupPhase] = {}
+        self.elapsed_ms = 0.0
+
+    async def run(self) -> Dict[str, StartupPhase]:
+        started = time.perf_counter()
+        loaded = await asyncio.gather(*(self._import(name) for name in self.modules))
+        imported = {name: module for name, module in zip(self.modules, loaded) if module is not None}
+
+        for name in self.modules:
+            missing = [dep for dep in self.phases[name].depends_on if dep not in self.phases]
+            if missing:
+                raise ValueError(f"{name} depends on modules that aren't loaded: {', '.join(missing)}")
+        self._check_cycles()
+
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self.modules:
+            tasks[name] = asyncio.create_task(self._setup(name, imported.get(name), tasks))
+        await asyncio.gather(*tasks.values())
+
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+        self.log_report()
+        return self.phases
+
+    async def _import(self, name: str):
+        phase = self.phases[name] = StartupPhase(name)
+        started = time.perf_counter()
+        try:
+            module = await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            phase.status = "import failed"
+            phase.error = repr(e)
+            logger.exception(f"Failed to import {name}")
+            return None
+        finally:
+            phase.import_ms = (time.perf_counter() - started) * 1000
+        phase.depends_on = tuple(getattr(module, "DEPENDS_ON", ()))
+        return module
+
+    def _check_cycles(self):
+        visiting, done = set(), set()
+
+        def visit(name: str, path: List[str]):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Startup dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.phases[name].depends_on:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.modules:
+            visit(name, [])
+
+    async def _setup(self, name: str, module, tasks: Dict[str, asyncio.Task]):
+        phase = self.phases[name]
+        if module is None:
+            return
+
+        started = time.perf_counter()
+        await asyncio.gather(*(tasks[dep] for dep in phase.depends_on))
+        phase.wait_ms = (time.perf_counter() - started) * 1000
+
+        failed = [dep for dep in phase.depends_on if self.phases[dep].status != "ok"]
+        if failed:
+            phase.status = "skipped"
+            phase.error = f"dependency failed: {', '.join(failed)}"
+            return
+
+        started = time.perf_counter()
+        try:
+            await module.setup(self.bot)
+            phase.status = "ok"
+        except Exception as e:
+            phase.status = "setup failed"
+            phase.error = repr(e)
+            logger.exception(f"Failed to set up {name}")
+        finally:
+            phase.setup_ms = (time.perf_counter() - started) * 1000
+
+    def log_report(self):
+        serial_ms = sum(phase.import_ms + phase.setup_ms for phase in self.phases.values())
+        lines = [f"{'module':<40} {'status':<13} {'import':>9} {'wait':>9} {'setup':>9}"]
+        for name in self.modules:
+            phase = self.phases[name]
+            lines.append(
+                f"{name:<40} {phase.status:<13} "
+                f"{phase.import_ms:7.1f}ms {phase.wait_ms:7.1f}ms {phase.setup_ms:7.1f}ms"
+                + (f"  {phase.error}" if phase.error else "")
+            )
+        lines.append(f"total {self.elapsed_ms:.1f}ms (serial sum {serial_ms:.1f}ms)")
+        logger.info("Startup report:\n" + "\n".join(lines))
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, phase in self.phases.items() if phase.status != "ok"]
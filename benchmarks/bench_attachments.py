@@ -0,0 +1,151 @@
+# benchmarks/bench_attachments.py
+# Compare sequential in-memory attachment downloads against AttachmentPipeline
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_attachments --files 8 --size-kb 4096
+import argparse
+import asyncio
+import io
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List
+import aiohttp
+from aiohttp import web
+from NightCityBot.NightCityBotAttachments import AttachmentPipeline
+
+
+class AttachmentCDNStandIn:
+    """Local aiohttp server that serves fixed-size files with injected latency."""
+
+    def __init__(self, size: int, latency: float = 0.0, chunk_size: int = 64 * 1024):
+        self.size = size
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self._payload = os.urandom(chunk_size)
+        self._runner = None
+        self.url = ""
+
+        self.app = web.Application()
+        self.app.router.add_get("/attachments/{name}", self.handle_get)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle_get(self, request: web.Request) -> web.StreamResponse:
+        await asyncio.sleep(self.latency)
+        response = web.StreamResponse(headers={"Content-Length": str(self.size)})
+        await response.prepare(request)
+        remaining = self.size
+        while remaining > 0:
+            chunk = self._payload[:min(remaining, self.chunk_size)]
+            await response.write(chunk)
+            remaining -= len(chunk)
+        await response.write_eof()
+        return response
+
+
+def fake_attachments(base_url: str, count: int, size: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            url=f"{base_url}/attachments/file-{i}.png",
+            filename=f"file-{i}.png",
+            size=size,
+            description=None,
+            is_spoiler=lambda: False
+        )
+        for i in range(count)
+    ]
+
+
+async def sequential_to_file(session: aiohttp.ClientSession, attachments) -> List[io.BytesIO]:
+    """The previous approach: read each attachment fully into memory, one after another."""
+    files = []
+    for attachment in attachments:
+        async with session.get(attachment.url) as response:
+            files.append(io.BytesIO(await response.read()))
+    return files
+
+
+async def measure(name: str, operation: Callable[[], Awaitable[int]], repeat: int):
+    timings = []
+    peaks = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        sent = await operation()
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(
+        f"{name:<24} files={sent:<4} "
+        f"best={min(timings) * 1000:8.1f}ms "
+        f"mean={sum(timings) / len(timings) * 1000:8.1f}ms "
+        f"peak_python_mem={max(peaks) / 1024 / 1024:7.2f}MiB"
+    )
+
+
+async def main(args):
+    size = args.size_kb * 1024
+    cdn = AttachmentCDNStandIn(size, latency=args.latency)
+    url = await cdn.start()
+    attachments = fake_attachments(url, args.files, size)
+    size_limit = args.limit_mb * 1024 * 1024
+
+    print(
+        f"files={args.files} size={args.size_kb}KiB latency={args.latency}s "
+        f"upload_limit={args.limit_mb}MiB concurrency={args.concurrency}"
+    )
+
+    session = aiohttp.ClientSession()
+    pipeline = AttachmentPipeline(
+        concurrency=args.concurrency,
+        spool_threshold=args.spool_kb * 1024
+    )
+    try:
+        async def baseline() -> int:
+            files = await sequential_to_file(session, attachments)
+            for f in files:
+                f.close()
+            return len(files)
+
+        async def pipelined() -> int:
+            prepared = await pipeline.prepare(attachments, size_limit)
+            try:
+                return len(prepared.files)
+            finally:
+                prepared.close()
+
+        await measure("sequential to_file", baseline, args.repeat)
+        await measure("AttachmentPipeline", pipelined, args.repeat)
+
+        prepared = await pipeline.prepare(attachments, size_limit)
+        print(f"re-uploaded={len(prepared.files)} linked={len(prepared.links)}")
+        prepared.close()
+    finally:
+        await session.close()
+        await pipeline.close()
+        await cdn.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark attachment re-upload preparation.")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request CDN latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--spool-kb", type=int, default=1024, help="Bytes kept in memory before spooling to disk")
+    parser.add_argument("--limit-mb", type=int, default=25, help="Destination upload limit")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+# benchmarks/bench_chunker.py
+# Compare the shared chunker against the old fixed 1990-character slicing
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_chunker
+import argparse
+import random
+import timeit
+from typing import Callable, Iterable, List, Set
+from NightCityBot.NightCityBotChunker import iter_chunks, pack_entries
+
+
+def naive_slices(entries: Iterable[str]) -> List[str]:
+    """The previous approach: one message per entry, long entries sliced every 1990 chars."""
+    messages = []
+    for entry in entries:
+        if len(entry) <= 2000:
+            messages.append(entry)
+        else:
+            messages.extend(entry[i:i + 1990] for i in range(0, len(entry), 1990))
+    return messages
+
+
+def build_entries(count: int, seed: int = 7) -> List[str]:
+    """Build RP-log style entries: mostly short lines, some long posts with links and markdown."""
+    rng = random.Random(seed)
+    words = ["the", "runner", "jacks", "into", "**Arasaka**", "ICE", "street", "chrome", "neon", "fixer"]
+    url = "https://cdn.discordapp.com/attachments/1366880900599517214/1379615621167321189/image.png"
+    entries = []
+    for i in range(count):
+        length = rng.choice([8, 15, 30, 60, 400, 900])
+        body = " ".join(rng.choice(words) for _ in range(length))
+        entry = f"[2025-06-01 12:{i % 60:02d}:00] 📥 **Received from Player{i % 7}**:\n{body}"
+        if rng.random() < 0.2:
+            entry += f"\n📎 Attachment: {url}"
+        if rng.random() < 0.05:
+            entry += "\n```\n" + "\n".join(rng.choice(words) for _ in range(200)) + "\n```"
+        entries.append(entry)
+    return entries
+
+
+def count_split_words(messages: List[str], vocabulary: Set[str]) -> int:
+    """Count splits that cut a word or URL in two, i.e. leave a token that isn't in the source text."""
+    splits = 0
+    for current, following in zip(messages, messages[1:]):
+        tail = current.split()
+        head = following.split()
+        if (tail and tail[-1].strip("`*") not in vocabulary) or (head and head[0].strip("`*") not in vocabulary):
+            splits += 1
+    return splits
+
+
+def bench(name: str, func: Callable[[], List[str]], repeat: int, vocabulary: Set[str]):
+    messages = func()
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(
+        f"{name:<24} messages={len(messages):<6} "
+        f"avg_fill={sum(map(len, messages)) / len(messages) / 2000:6.1%} "
+        f"mid_word_splits={count_split_words(messages, vocabulary):<5} "
+        f"time={seconds * 1000:8.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark message chunking strategies.")
+    parser.add_argument("--entries", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    entries = build_entries(args.entries)
+    long_text = "\n".join(entries)
+    vocabulary = {token.strip("`*") for token in long_text.split()} | {""}
+    print(f"entries={len(entries)} total_chars={len(long_text)}")
+
+    bench("naive per-entry slicing", lambda: naive_slices(entries), args.repeat, vocabulary)
+    bench("pack_entries", lambda: list(pack_entries(entries)), args.repeat, vocabulary)
+    bench("naive single-text slicing", lambda: naive_slices([long_text]), args.repeat, vocabulary)
+    bench("iter_chunks", lambda: list(iter_chunks(long_text)), args.repeat, vocabulary)
@@ -0,0 +1,79 @@
+# benchmarks/bench_dice.py
+# Compare the old per-die randint list against DiceEngine, and measure event loop stalls
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_dice --sizes 10 1000 100000 1000000
+import argparse
+import asyncio
+import random
+import time
+import timeit
+import tracemalloc
+from typing import Callable
+from NightCityBot.NightCityBotDiceEngine import DiceEngine
+
+
+def old_roll(count: int, sides: int) -> int:
+    """The previous approach: one randint per die, all kept in a list."""
+    rolls = [random.randint(1, sides) for _ in range(count)]
+    return sum(rolls)
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+async def max_loop_stall(roll: Callable[[], object], interval: float = 0.001) -> float:
+    """Run roll() while a ticker measures the longest gap between its wakeups."""
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            stall = max(stall, now - last - interval)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(interval * 5)
+    result = roll()
+    if asyncio.iscoroutine(result):
+        await result
+    await asyncio.sleep(interval * 5)
+    running = False
+    await task
+    return stall
+
+
+async def main(args):
+    engine = DiceEngine(max_count=max(args.sizes))
+    print(f"sides={args.sides} list_threshold={engine.list_threshold} offload_threshold={engine.offload_threshold}")
+
+    for count in args.sizes:
+        old_time = min(timeit.repeat(lambda: old_roll(count, args.sides), number=1, repeat=args.repeat))
+        new_time = min(timeit.repeat(lambda: engine.roll_sync(count, args.sides), number=1, repeat=args.repeat))
+        old_peak = peak_memory(lambda: old_roll(count, args.sides))
+        new_peak = peak_memory(lambda: engine.roll_sync(count, args.sides))
+        old_stall = await max_loop_stall(lambda: old_roll(count, args.sides))
+        new_stall = await max_loop_stall(lambda: engine.roll(count, args.sides))
+        print(
+            f"{count:>9}d{args.sides:<4} "
+            f"time old={old_time * 1000:9.2f}ms new={new_time * 1000:9.2f}ms | "
+            f"peak_mem old={old_peak / 1024:9.1f}KiB new={new_peak / 1024:7.1f}KiB | "
+            f"loop_stall old={old_stall * 1000:8.2f}ms new={new_stall * 1000:6.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dice pool rolling.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000, 1_000_000])
+    parser.add_argument("--sides", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,72 @@
+# benchmarks/bench_dice_expressions.py
+# Compare the old single-term regex roll path against compiled, cached dice plans
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_dice_expressions --rolls 100000
+import argparse
+import random
+import re
+import timeit
+from typing import Callable, List
+from NightCityBot.NightCityBotDiceEngine import DiceCompiler, DiceEngine
+
+COMMON = ["1d20", "2d6+3", "d20+5", "3d6", "1d100", "2d10 - 1", "4d6", "1d8+2"]
+RICH = ["2d6+1d4+3", "4d6kh3", "3d10!", "2d20kl1+4"]
+
+
+def old_roll(dice: str) -> int:
+    """The previous path: regex per call, one randint per die."""
+    dice_pattern = r'(?:(\d*)d)?(\d+)([+-]\d+)?'
+    match = re.fullmatch(dice_pattern, dice.replace(' ', ''))
+    dice_count, dice_sides, modifier = match.groups()
+    dice_count = int(dice_count) if dice_count else 1
+    dice_sides = int(dice_sides)
+    modifier = int(modifier) if modifier else 0
+    rolls = [random.randint(1, dice_sides) for _ in range(dice_count)]
+    return sum(rolls) + modifier
+
+
+def old_parse(dice: str):
+    """The previous parse step on its own."""
+    match = re.fullmatch(r'(?:(\d*)d)?(\d+)([+-]\d+)?', dice.replace(' ', ''))
+    return match.groups()
+
+
+def bench(name: str, func: Callable[[], object], rolls: int, repeat: int):
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{name:<36} total={seconds * 1000:8.1f}ms per_roll={seconds / rolls * 1e6:6.2f}µs")
+
+
+def workload(expressions: List[str], rolls: int, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(expressions) for _ in range(rolls)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dice expression parsing and evaluation.")
+    parser.add_argument("--rolls", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = DiceEngine()
+    common = workload(COMMON, args.rolls)
+    rich = workload(RICH, args.rolls)
+
+    def compiled(expressions: List[str], compiler: DiceCompiler) -> Callable[[], list]:
+        return lambda: [engine.evaluate_sync(compiler.compile(expression)).total for expression in expressions]
+
+    def uncached(expressions: List[str]) -> Callable[[], list]:
+        # A zero-size cache forces a full parse on every roll
+        return compiled(expressions, DiceCompiler(cache_size=0))
+
+    def parse_only(expressions: List[str], compiler: DiceCompiler) -> Callable[[], list]:
+        return lambda: [compiler.compile(expression) for expression in expressions]
+
+    print(f"rolls={args.rolls}")
+    bench("common: old regex path", lambda: [old_roll(expression) for expression in common], args.rolls, args.repeat)
+    bench("common: compiled, no cache", uncached(common), args.rolls, args.repeat)
+    bench("common: compiled, cached", compiled(common, DiceCompiler()), args.rolls, args.repeat)
+    bench("common: old regex parse only", lambda: [old_parse(expression) for expression in common], args.rolls, args.repeat)
+    bench("common: parse only, no cache", parse_only(common, DiceCompiler(cache_size=0)), args.rolls, args.repeat)
+    bench("common: parse only, cached", parse_only(common, DiceCompiler()), args.rolls, args.repeat)
+    bench("rich syntax: compiled, cached", compiled(rich, DiceCompiler()), args.rolls, args.repeat)
@@ -0,0 +1,162 @@
+# benchmarks/bench_economy.py
+# Load-test EconomyService against the local UnbelievaBoat stand-in
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_economy --concurrency 32 --requests 2000
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotEconomyService import EconomyService, UnknownOutcomeError
+from NightCityBot.NightCityBotRentService import RentService
+from NightCityBot.benchmarks.unbelievaboat_standin import UnbelievaBoatStandIn
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name: str, latencies: List[float], elapsed: float, failures: int = 0):
+    count = len(latencies)
+    print(
+        f"{name:<16} n={count:<6} "
+        f"p50={percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p95={percentile(latencies, 95) * 1000:7.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:7.2f}ms "
+        f"mean={statistics.fmean(latencies) * 1000 if latencies else 0:7.2f}ms "
+        f"throughput={count / elapsed if elapsed else 0:8.1f}/s "
+        f"failures={failures}"
+    )
+
+
+async def run_scenario(
+        name: str,
+        operation: Callable[[int], Awaitable[bool]],
+        requests: int,
+        concurrency: int
+):
+    """Run operation(i) for i in range(requests) with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await operation(i)
+            except UnknownOutcomeError:
+                # An injected 5xx on a PATCH: not retried, so it counts as a failure here
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    report(name, latencies, time.perf_counter() - started, failures)
+
+
+async def bench_bulk_billing(config: BotConfig, economy: EconomyService, members: int):
+    """Time a full rent run over a synthetic guild."""
+    role_sets = [
+        ["Housing Tier 1", "Trauma Team Silver"],
+        ["Housing Tier 2", "Business Tier 1"],
+        ["Housing Tier 3", "Business Tier 2", "Trauma Team Gold"],
+        ["Verified"]
+    ]
+    guild = SimpleNamespace(members=[
+        SimpleNamespace(
+            id=900_000 + i,
+            display_name=f"member-{i}",
+            bot=False,
+            roles=[SimpleNamespace(name=name) for name in role_sets[i % len(role_sets)]]
+        )
+        for i in range(members)
+    ])
+    bot = SimpleNamespace(get_channel=lambda channel_id: None)
+
+    rent_service = RentService(bot, config, economy)
+    started = time.perf_counter()
+    summary = await rent_service.collect_rent(guild)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{'bulk billing':<16} members={summary.billed:<6} charged={summary.charged} "
+        f"failed={len(summary.failures)} unknown={len(summary.unknown)} elapsed={elapsed:.2f}s "
+        f"throughput={summary.billed / elapsed if elapsed else 0:8.1f} members/s"
+    )
+
+
+async def main(args):
+    standin = UnbelievaBoatStandIn(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        window_limit=args.window_limit
+    )
+    url = await standin.start()
+
+    workdir = tempfile.mkdtemp(prefix="ncbot-bench-")
+    config = BotConfig(
+        UNBELIEVABOAT_API_URL=url,
+        RENT_CONCURRENCY=args.concurrency,
+        ECONOMY_RATE_LIMIT=args.client_rate,
+        ECONOMY_RATE_BURST=max(int(args.client_rate), 1),
+        LAST_RENT_FILE=os.path.join(workdir, "last_rent.json"),
+        RENT_JOURNAL_FILE=os.path.join(workdir, "rent_journal.jsonl")
+    )
+    economy = EconomyService(config)
+    await economy.start()
+
+    print(
+        f"concurrency={args.concurrency} requests={args.requests} latency={args.latency}s "
+        f"error_rate={args.error_rate} rate_limit_rate={args.rate_limit_rate}"
+    )
+    try:
+        async def get_balance(i: int) -> bool:
+            return await economy.get_balance(i, use_cache=False) is not None
+
+        async def update_balance(i: int) -> bool:
+            return await economy.update_balance(i, {"cash": 1}, "benchmark")
+
+        async def deduct_amount(i: int) -> bool:
+            success, _ = await economy.deduct_amount(100_000 + i, 10, "benchmark")
+            return success
+
+        await run_scenario("get_balance", get_balance, args.requests, args.concurrency)
+        await run_scenario("update_balance", update_balance, args.requests, args.concurrency)
+        await run_scenario("deduct_amount", deduct_amount, args.requests, args.concurrency)
+        await bench_bulk_billing(config, economy, args.members)
+
+        print(f"pool: {economy.pool_stats()}")
+        print(f"cache: {economy.cache_stats()}")
+        print(f"rate limiter: {economy.rate_limit_stats()}")
+        print(f"stand-in responses: {dict(standin.responses)}")
+    finally:
+        await economy.close()
+        await standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark EconomyService against a local stand-in.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=2000, help="Synthetic guild size for bulk billing")
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--window-limit", type=int, default=0, help="Stand-in requests allowed per second")
+    parser.add_argument("--client-rate", type=float, default=1000.0, help="Client token bucket rate per second")
+    asyncio.run(main(parser.parse_args()))
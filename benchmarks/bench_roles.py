@@ -0,0 +1,98 @@
+# benchmarks/bench_roles.py
+# Compare role-name list scans against RoleIndex lookups
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m NightCityBot.benchmarks.bench_roles --members 5000 --roles-per-member 25
+import argparse
+import random
+import timeit
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+import discord
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotRoleIndex import RoleIndex
+
+
+class FakeMember:
+    """Mimics discord.Member: raw role ids, with .roles resolving and sorting Role objects per access."""
+
+    def __init__(self, role_ids: List[int], guild_roles: Dict[int, SimpleNamespace]):
+        self._roles = role_ids
+        self._guild_roles = guild_roles
+
+    @property
+    def roles(self):
+        return sorted((self._guild_roles[role_id] for role_id in self._roles), key=lambda role: role.position)
+
+
+def build_guild(config: BotConfig, members: int, roles_per_member: int, seed: int = 11):
+    rng = random.Random(seed)
+    configured = [config.FIXER_ROLE_NAME]
+    for table in (config.HOUSING_ROLE_COSTS, config.BUSINESS_ROLE_COSTS,
+                  config.TRAUMA_ROLE_COSTS, config.NETRUNNER_BONUSES):
+        configured.extend(table)
+    names = configured + [f"Flavour Role {i}" for i in range(200)]
+
+    guild_roles = {
+        1_000 + i: SimpleNamespace(id=1_000 + i, name=name, position=i)
+        for i, name in enumerate(names)
+    }
+    role_ids = list(guild_roles)
+    guild = SimpleNamespace(name="bench", roles=list(guild_roles.values()))
+    people = [
+        FakeMember(sorted(rng.sample(role_ids, roles_per_member)), guild_roles)
+        for _ in range(members)
+    ]
+    return guild, people
+
+
+def bench(name: str, func: Callable[[], object], repeat: int, members: int):
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{name:<32} total={seconds * 1000:8.2f}ms per_member={seconds / members * 1e6:7.3f}µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark role membership checks.")
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--roles-per-member", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    config = BotConfig()
+    guild, people = build_guild(config, args.members, args.roles_per_member)
+    index = RoleIndex(config)
+    index.rebuild(guild)
+
+    fixer = config.FIXER_ROLE_NAME
+
+    def old_is_fixer():
+        return [discord.utils.get(member.roles, name=fixer) is not None for member in people]
+
+    def old_relay_check():
+        return [any(role.name == fixer for role in member.roles) for member in people]
+
+    def old_netrunner_bonus():
+        bonuses = []
+        for member in people:
+            user_roles = [role.name for role in member.roles]
+            bonus = 0
+            if "Netrunner Level 2" in user_roles:
+                bonus = 1
+            elif "Netrunner Level 3" in user_roles:
+                bonus = 2
+            bonuses.append(bonus)
+        return bonuses
+
+    def new_is_fixer():
+        return [index.has_category(member, "fixer") for member in people]
+
+    def new_netrunner_bonus():
+        return [index.best_value(member, "netrunner") for member in people]
+
+    assert old_is_fixer() == new_is_fixer() == old_relay_check()
+    print(f"members={args.members} roles_per_member={args.roles_per_member} guild_roles={len(guild.roles)}")
+    bench("is_fixer: utils.get scan", old_is_fixer, args.repeat, args.members)
+    bench("is_fixer: any(role.name == ...)", old_relay_check, args.repeat, args.members)
+    bench("is_fixer: RoleIndex", new_is_fixer, args.repeat, args.members)
+    bench("netrunner bonus: name list", old_netrunner_bonus, args.repeat, args.members)
+    bench("netrunner bonus: RoleIndex", new_netrunner_bonus, args.repeat, args.members)
@@ -0,0 +1,194 @@
+# benchmarks/unbelievaboat_standin.py
+# In-memory stand-in for the UnbelievaBoat user balance API
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class UnbelievaBoatStandIn:
+    """
+    Local aiohttp server implementing GET/PATCH /guilds/{guild_id}/users/{user_id}.
+
+    Latency, 5xx error rate and 429 responses can be injected, and a fixed
+    window limit reports X-RateLimit-* headers like the real API. late_reply
+    delays the response after a PATCH has been applied, to simulate a charge
+    whose response is lost to a client timeout.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            retry_after: float = 0.05,
+            window_limit: int = 0,
+            window: float = 1.0,
+            starting_cash: int = 10000,
+            starting_bank: int = 10000,
+            late_reply: float = 0.0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.window_limit = window_limit
+        self.window = window
+        self.starting_cash = starting_cash
+        self.starting_bank = starting_bank
+        self.late_reply = late_reply
+
+        self.balances: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.responses: Counter = Counter()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+        self.app = web.Application()
+        self.app.router.add_get("/guilds/{guild_id}/users/{user_id}", self.handle_get)
+        self.app.router.add_patch("/guilds/{guild_id}/users/{user_id}", self.handle_patch)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the API base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}"
+        logger.info(f"UnbelievaBoat stand-in listening on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def set_balance(self, guild_id: int, user_id: int, cash: int, bank: int):
+        self.balances[(str(guild_id), str(user_id))] = {"cash": cash, "bank": bank}
+
+    def _user(self, request: web.Request) -> Tuple[str, Dict[str, int]]:
+        key = (request.match_info["guild_id"], request.match_info["user_id"])
+        if key not in self.balances:
+            self.balances[key] = {"cash": self.starting_cash, "bank": self.starting_bank}
+        return key[1], self.balances[key]
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        if not self.window_limit:
+            return {}
+        reset = self._window_start + self.window
+        return {
+            "X-RateLimit-Limit": str(self.window_limit),
+            "X-RateLimit-Remaining": str(max(self.window_limit - self._window_count, 0)),
+            "X-RateLimit-Reset": str(int((time.time() + reset - time.monotonic()) * 1000))
+        }
+
+    async def _gate(self) -> Optional[web.Response]:
+        """Apply injected latency, errors and rate limits. Returns an error response or None."""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+        over_limit = self.window_limit and self._window_count > self.window_limit
+        if over_limit or random.random() < self.rate_limit_rate:
+            retry_after = (self._window_start + self.window - now) if over_limit else self.retry_after
+            self.responses[429] += 1
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": int(retry_after * 1000)},
+                status=429,
+                headers={"Retry-After": f"{retry_after:.3f}", **self._rate_limit_headers()}
+            )
+
+        if random.random() < self.error_rate:
+            self.responses[500] += 1
+            return web.json_response({"message": "Internal Server Error"}, status=500)
+
+        return None
+
+    def _user_payload(self, user_id: str, balance: Dict[str, int]) -> Dict:
+        return {
+            "rank": None,
+            "user_id": user_id,
+            "cash": balance["cash"],
+            "bank": balance["bank"],
+            "total": balance["cash"] + balance["bank"]
+        }
+
+    async def handle_get(self, request: web.Request) -> web.Response:
+        error = await self._gate()
+        if error:
+            return error
+
+        user_id, balance = self._user(request)
+        self.responses[200] += 1
+        return web.json_response(self._user_payload(user_id, balance), headers=self._rate_limit_headers())
+
+    async def handle_patch(self, request: web.Request) -> web.Response:
+        error = await self._gate()
+        if error:
+            return error
+
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError:
+            self.responses[400] += 1
+            return web.json_response({"message": "Invalid JSON"}, status=400)
+
+        user_id, balance = self._user(request)
+        for key in ("cash", "bank"):
+            if key in payload:
+                balance[key] += int(payload[key])
+
+        if self.late_reply:
+            await asyncio.sleep(self.late_reply)
+        self.responses[200] += 1
+        return web.json_response(self._user_payload(user_id, balance), headers=self._rate_limit_headers())
+
+
+async def _serve(args):
+    standin = UnbelievaBoatStandIn(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        window_limit=args.window_limit
+    )
+    url = await standin.start(args.host, args.port)
+    print(f"Serving UnbelievaBoat stand-in at {url} (set UNBELIEVABOAT_API_URL to this)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local UnbelievaBoat stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--window-limit", type=int, default=0, help="Requests allowed per second (0 = unlimited)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
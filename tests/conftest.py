@@ -0,0 +1,42 @@
+# tests/conftest.py
+# Shared fixtures: a BotConfig rooted in a temp directory and EconomyService against the local stand-in
+#
+# Run from the directory containing the NightCityBot package:
+#   python -m pytest NightCityBot/tests
+from contextlib import asynccontextmanager
+import pytest
+from NightCityBot.NightCityBotConfig import BotConfig
+from NightCityBot.NightCityBotEconomyService import EconomyService
+from NightCityBot.benchmarks.unbelievaboat_standin import UnbelievaBoatStandIn
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    # BotConfig creates data/ and logs/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    config = BotConfig()
+    config.ECONOMY_BACKOFF_BASE = 0.01
+    config.ECONOMY_REQUEST_TIMEOUT = 2.0
+    config.RENT_JOURNAL_FILE = str(tmp_path / "rent_journal.jsonl")
+    config.LAST_RENT_FILE = str(tmp_path / "last_rent.json")
+    config.THREAD_MAP_FILE = str(tmp_path / "thread_map.json")
+    return config
+
+
+@pytest.fixture
+def economy(config):
+    """Factory for `async with economy(**standin_options) as (service, standin)`."""
+
+    @asynccontextmanager
+    async def start(**standin_options):
+        standin = UnbelievaBoatStandIn(**standin_options)
+        config.UNBELIEVABOAT_API_URL = await standin.start()
+        service = EconomyService(config)
+        await service.start()
+        try:
+            yield service, standin
+        finally:
+            await service.close()
+            await standin.stop()
+
+    return start
@@ -0,0 +1,116 @@
+# tests/test_attachments.py
+# Attachment downloads spool to memory or disk and are always released
+import asyncio
+import tempfile
+from types import SimpleNamespace
+from aiohttp import web
+import discord
+from NightCityBot.NightCityBotAttachments import AttachmentPipeline, PreparedAttachments
+from NightCityBot.NightCityBotProfiler import ApiCallTracker, current_handler
+
+SMALL = b"s" * 1000
+LARGE = bytes(range(256)) * 1024  # 256 KiB
+
+
+def attachment(url, filename, size):
+    return SimpleNamespace(url=url, filename=filename, size=size, description=None, is_spoiler=lambda: False)
+
+
+async def serve():
+    async def small(request):
+        return web.Response(body=SMALL)
+
+    async def large(request):
+        return web.Response(body=LARGE)
+
+    app = web.Application()
+    app.router.add_get("/small", small)
+    app.router.add_get("/large", large)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def test_downloads_spool_to_memory_or_disk_and_missing_files_become_links():
+    async def scenario():
+        runner, base = await serve()
+        pipeline = AttachmentPipeline(spool_threshold=64 * 1024, chunk_size=16 * 1024)
+        try:
+            prepared = await pipeline.prepare([
+                attachment(f"{base}/small", "small.txt", len(SMALL)),
+                attachment(f"{base}/large", "large.bin", len(LARGE)),
+                attachment(f"{base}/missing", "missing.png", 10)
+            ], size_limit=10 * 1024 * 1024)
+            contents = [file.fp.read() for file in prepared.files]
+            rolled = [spool._rolled for spool in prepared.spools]
+            prepared.close()
+            return base, prepared, contents, rolled
+        finally:
+            await pipeline.close()
+            await runner.cleanup()
+
+    base, prepared, contents, rolled = asyncio.run(scenario())
+    assert contents == [SMALL, LARGE]
+    assert rolled == [False, True]
+    assert prepared.links == [f"{base}/missing"]
+
+
+def test_disk_errors_fall_back_to_a_link_without_failing_the_batch(monkeypatch):
+    async def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(asyncio, "to_thread", disk_full)
+
+    async def scenario():
+        runner, base = await serve()
+        pipeline = AttachmentPipeline(spool_threshold=64 * 1024, chunk_size=16 * 1024)
+        try:
+            prepared = await pipeline.prepare([
+                attachment(f"{base}/small", "small.txt", len(SMALL)),
+                attachment(f"{base}/large", "large.bin", len(LARGE))
+            ], size_limit=10 * 1024 * 1024)
+            contents = [file.fp.read() for file in prepared.files]
+            prepared.close()
+            return base, prepared, contents
+        finally:
+            await pipeline.close()
+            await runner.cleanup()
+
+    base, prepared, contents = asyncio.run(scenario())
+    assert contents == [SMALL]
+    assert prepared.links == [f"{base}/large"]
+
+
+def test_downloads_are_counted_by_the_api_call_tracker():
+    tracker = ApiCallTracker()
+
+    async def scenario():
+        runner, base = await serve()
+        pipeline = AttachmentPipeline(trace_configs=[tracker.trace_config()])
+        current_handler.set("listener:on_message")
+        try:
+            prepared = await pipeline.prepare([
+                attachment(f"{base}/small", "small.txt", len(SMALL)),
+                attachment(f"{base}/large", "large.bin", len(LARGE))
+            ], size_limit=10 * 1024 * 1024)
+            prepared.close()
+        finally:
+            await pipeline.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    stats = tracker.stats["listener:on_message"]
+    assert stats.calls == 2
+    assert set(stats.endpoints) == {"GET 127.0.0.1/small", "GET 127.0.0.1/large"}
+
+
+def test_close_releases_spools_even_if_no_send_ran():
+    spool = tempfile.SpooledTemporaryFile(max_size=10)
+    spool.write(b"more than ten bytes")
+    spool.seek(0)
+    prepared = PreparedAttachments(files=[discord.File(spool, filename="a.bin")], spools=[spool])
+
+    prepared.close()
+    assert spool.closed
@@ -0,0 +1,52 @@
+# tests/test_audit.py
+# AuditService shutdown: nothing logged while stopping is lost, and the closed index is reported
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+import pytest
+from NightCityBot.NightCityBotAuditService import AuditService
+
+FIXER = SimpleNamespace(id=7)
+
+
+@pytest.fixture
+def service(config, tmp_path):
+    config.AUDIT_DB_FILE = str(tmp_path / "audit.db")
+    config.AUDIT_FLUSH_DELAY = 0.01
+    return AuditService(config)
+
+
+def logged_actions(service):
+    with open(service._file_logger.handlers[0].baseFilename, encoding="utf-8") as f:
+        return [json.loads(line)["action"] for line in f]
+
+
+def test_entries_logged_while_stopping_are_kept(service, caplog):
+    async def scenario():
+        service.start()
+        await service.log_audit(FIXER, "before stop")
+        stopping = asyncio.create_task(service.stop())
+        await asyncio.sleep(0)  # stop() has queued its sentinel
+        await service.log_audit(FIXER, "during stop")
+        await stopping
+        await service.log_audit(FIXER, "after stop")
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(scenario())
+
+    actions = logged_actions(service)
+    # Entries logged after stop() began are written directly, so they may land before queued ones
+    assert sorted(actions[-3:]) == ["after stop", "before stop", "during stop"]
+    assert caplog.text.count("Audit service is stopped") == 1
+
+
+def test_query_after_stop_reports_the_closed_index(service):
+    async def scenario():
+        service.start()
+        await service.log_audit(FIXER, "indexed", action_type="post")
+        await service.stop()
+        await service.query(action_type="post")
+
+    with pytest.raises(RuntimeError, match="audit index closed"):
+        asyncio.run(scenario())
@@ -0,0 +1,107 @@
+# tests/test_chunker.py
+# Boundary-aware message splitting and entry packing
+import random
+import pytest
+from NightCityBot.NightCityBotChunker import BOLD, FENCE, MESSAGE_LIMIT, iter_chunks, pack_entries
+
+URL = "https://cdn.discordapp.com/attachments/1366880900599517214/1379437060389339156/afterlife-menu.png"
+
+
+def fences_balanced(chunk):
+    return chunk.count(FENCE) % 2 == 0
+
+
+def bold_balanced(chunk):
+    # Bold markers inside code fences don't count
+    return sum(part.count(BOLD) for part in chunk.split(FENCE)[0::2]) % 2 == 0
+
+
+@pytest.mark.parametrize("text", ["", "short"])
+def test_short_text_is_a_single_chunk_or_nothing(text):
+    assert list(iter_chunks(text)) == ([text] if text else [])
+
+
+def test_chunks_never_exceed_the_limit():
+    text = "x" * (MESSAGE_LIMIT * 3 + 17)
+    chunks = list(iter_chunks(text))
+    assert all(len(chunk) <= MESSAGE_LIMIT for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_splits_keep_words_and_urls_intact():
+    words = [URL if i % 7 == 0 else f"word{i}" for i in range(600)]
+    chunks = list(iter_chunks(" ".join(words), limit=500))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert [word for chunk in chunks for word in chunk.split(" ")] == words
+
+
+def test_splits_prefer_newlines_over_spaces():
+    lines = [f"line {i} of the gig briefing" for i in range(200)]
+    chunks = list(iter_chunks("\n".join(lines), limit=300))
+
+    assert [line for chunk in chunks for line in chunk.split("\n")] == lines
+
+
+def test_open_code_fences_are_closed_and_reopened_with_their_language():
+    text = "Loadout:\n" + FENCE + "py\n" + "\n".join(f"slot_{i} = 'mantis blades'" for i in range(150)) + "\n" + FENCE
+    chunks = list(iter_chunks(text, limit=400))
+
+    assert len(chunks) > 2
+    assert all(len(chunk) <= 400 and fences_balanced(chunk) for chunk in chunks)
+    assert all(chunk.startswith(FENCE + "py\n") for chunk in chunks[1:])
+
+
+def test_open_bold_is_closed_and_reopened():
+    text = BOLD + " ".join(f"word{i}" for i in range(300)) + BOLD
+    chunks = list(iter_chunks(text, limit=250))
+
+    assert len(chunks) > 2
+    assert all(len(chunk) <= 250 and bold_balanced(chunk) for chunk in chunks)
+    assert all(chunk.startswith(BOLD) and chunk.endswith(BOLD) for chunk in chunks)
+
+
+@pytest.mark.parametrize("pieces, check", [
+    (["word", URL, BOLD, FENCE + "\n", "\n", " ", "a" * 120], fences_balanced),
+    (["word", URL, BOLD, "\n", " ", "a" * 120], bold_balanced)
+])
+def test_random_markdown_stays_within_the_limit_and_balanced(pieces, check):
+    rng = random.Random(2077)
+    for _ in range(200):
+        text = "".join(rng.choice(pieces) + rng.choice(" \n") for _ in range(rng.randint(50, 400)))
+        # Balance the input so every chunk should come out balanced too
+        if not fences_balanced(text):
+            text += FENCE
+        if not bold_balanced(text):
+            text += BOLD
+
+        for chunk in iter_chunks(text, limit=300):
+            assert len(chunk) <= 300
+            assert check(chunk)
+
+
+def test_pack_entries_fills_messages_in_order():
+    entries = [f"entry {i}: " + "x" * 90 for i in range(50)]
+    messages = list(pack_entries(entries, limit=500))
+
+    assert all(len(message) <= 500 for message in messages)
+    assert [entry for message in messages for entry in message.split("\n")] == entries
+    # Each message is as full as it can be: the next entry wouldn't have fit
+    for message, following in zip(messages, messages[1:]):
+        assert len(message) + 1 + len(following.split("\n")[0]) > 500
+
+
+def test_pack_entries_holds_back_the_last_chunk_of_an_oversized_entry():
+    oversized = " ".join(f"word{i}" for i in range(200))
+    messages = list(pack_entries(["before", oversized, "after"], limit=300))
+
+    assert messages[0] == "before"
+    assert all(len(message) <= 300 for message in messages)
+    # The oversized entry's tail shares a message with the entry after it
+    assert messages[-1].endswith("\nafter")
+    assert messages[-1].split("\n")[0] == list(iter_chunks(oversized, limit=300))[-1]
+
+
+def test_pack_entries_skips_empty_entries():
+    assert list(pack_entries(["", "a", "", "b"])) == ["a\nb"]
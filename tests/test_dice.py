@@ -0,0 +1,71 @@
+# tests/test_dice.py
+# Dice expression grammar, including the original bare-number syntax
+import asyncio
+import random
+from types import SimpleNamespace
+import pytest
+from NightCityBot.NightCityBotChunker import MESSAGE_LIMIT
+from NightCityBot.NightCityBotDiceEngine import DiceCompiler, DiceExpressionError
+from NightCityBot.NightCityBotDiceService import DiceModule
+
+
+def shape(expression):
+    plan = DiceCompiler().compile(expression)
+    return [(term.sign, term.count, term.sides) for term in plan.terms], plan.modifier
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("20", ([(1, 1, 20)], 0)),
+    ("20+3", ([(1, 1, 20)], 3)),
+    ("20 - 2", ([(1, 1, 20)], -2)),
+    ("d20+5", ([(1, 1, 20)], 5)),
+    ("2d6+3", ([(1, 2, 6)], 3)),
+    ("3+2d6", ([(1, 2, 6)], 3)),
+    ("2d6+1d4+3", ([(1, 2, 6), (1, 1, 4)], 3)),
+])
+def test_expressions_compile(expression, expected):
+    assert shape(expression) == expected
+
+
+def test_bare_number_display():
+    assert DiceCompiler().compile("20+3").display == "1d20 + 3"
+
+
+@pytest.mark.parametrize("expression", ["", "+3", "-20", "2d6*3", "abc", "4d6kh5"])
+def test_invalid_expressions(expression):
+    with pytest.raises(DiceExpressionError):
+        DiceCompiler().compile(expression)
+
+
+@pytest.fixture
+def dice(config):
+    module = DiceModule(SimpleNamespace(config=config))
+    module.engine.rng = random.Random(7)
+    return module
+
+
+def roll_body(dice, expression):
+    return dice.format_results(dice.engine.evaluate_sync(dice.compiler.compile(expression)))
+
+
+@pytest.mark.parametrize("expression", ["100d6+100d6+100d6", "100d1000+100d1000", "60d1000+50d1000"])
+def test_the_list_threshold_covers_the_whole_roll(dice, expression):
+    body = roll_body(dice, expression)
+    assert body.startswith("**Summary:**")
+    assert len(body) < MESSAGE_LIMIT
+
+
+def test_small_rolls_are_listed(dice):
+    body = roll_body(dice, "2d6+1d4")
+    assert body.startswith("**Results:**")
+    assert body.count("**") == 2 + 3 * 2
+
+
+def test_long_results_are_sent_in_chunks(dice):
+    sent = []
+    destination = SimpleNamespace(send=lambda content: asyncio.sleep(0, sent.append(content)))
+    body = roll_body(dice, "+".join(["200d20"] * 12))
+
+    asyncio.run(dice.send_chunked(destination, body))
+    assert len(body) > MESSAGE_LIMIT
+    assert len(sent) > 1 and all(len(chunk) <= MESSAGE_LIMIT for chunk in sent)
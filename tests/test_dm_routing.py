@@ -0,0 +1,79 @@
+# tests/test_dm_routing.py
+# DMCog.on_message routes DMs to logging and DM-thread replies to the relay; rolls log to the DM thread
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+import discord
+import pytest
+from NightCityBot.NightCityBotDiceService import DiceModule
+from NightCityBot.NightCityBotDMService import DMCog, DMService
+
+THREAD_ID = 555
+
+
+@pytest.fixture
+def cog(config):
+    cog = DMCog(SimpleNamespace(config=config))
+    cog.dm_service._set_thread("42", THREAD_ID)
+    cog.dm_service.handle_dm_message = AsyncMock()
+    cog.dm_service.handle_thread_relay = AsyncMock()
+    return cog
+
+
+def message(channel, content="hello", bot=False):
+    return SimpleNamespace(author=SimpleNamespace(bot=bot), channel=channel, content=content)
+
+
+def thread(thread_id):
+    channel = MagicMock(spec=discord.Thread)
+    channel.id = thread_id
+    return channel
+
+
+def test_dms_are_logged(cog):
+    asyncio.run(cog.on_message(message(MagicMock(spec=discord.DMChannel))))
+    cog.dm_service.handle_dm_message.assert_awaited_once()
+    cog.dm_service.handle_thread_relay.assert_not_awaited()
+
+
+@pytest.mark.parametrize("content", ["see you at the Afterlife", "!roll 1d20"])
+def test_dm_thread_messages_are_relayed(cog, content):
+    asyncio.run(cog.on_message(message(thread(THREAD_ID), content)))
+    cog.dm_service.handle_thread_relay.assert_awaited_once()
+
+
+@pytest.mark.parametrize("msg", [
+    message(thread(THREAD_ID), "!post #general hi"),
+    message(thread(THREAD_ID + 1)),
+    message(MagicMock(spec=discord.DMChannel), bot=True)
+])
+def test_other_messages_are_ignored(cog, msg):
+    asyncio.run(cog.on_message(msg))
+    cog.dm_service.handle_dm_message.assert_not_awaited()
+    cog.dm_service.handle_thread_relay.assert_not_awaited()
+
+
+def test_relayed_rolls_are_logged_to_the_cached_dm_thread(config):
+    dm_thread = thread(THREAD_ID)
+    dm_thread.send = AsyncMock()
+    user = SimpleNamespace(id=42, name="v", display_name="V", create_dm=AsyncMock())
+    user.create_dm.return_value = SimpleNamespace(send=AsyncMock())
+    bot = SimpleNamespace(
+        config=config,
+        role_index=SimpleNamespace(best_value=lambda member, category: 0),
+        get_channel=lambda channel_id: dm_thread if channel_id == THREAD_ID else None,
+        fetch_channel=AsyncMock()
+    )
+    bot.dm_service = DMService(config)
+    bot.dm_service.set_bot(bot)
+    bot.dm_service._set_thread("42", THREAD_ID)
+    dice = DiceModule(bot)
+
+    fixer = SimpleNamespace(display_name="Rogue")
+    asyncio.run(dice.loggable_roll(user, MagicMock(spec=discord.DMChannel), "1d20", original_sender=fixer))
+
+    user.create_dm.return_value.send.assert_awaited_once()
+    logged = dm_thread.send.await_args.args[0]
+    assert logged.startswith("📤 **Sent to V by Rogue:** `!roll 1d20`")
+    bot.fetch_channel.assert_not_awaited()
+    assert bot.dm_service.thread_cache_hits == 1
@@ -0,0 +1,136 @@
+# tests/test_economy.py
+# EconomyService retries and line-item charging against the UnbelievaBoat stand-in
+import asyncio
+import time
+import pytest
+from NightCityBot.NightCityBotEconomyService import LineItem, TokenBucketLimiter, UnknownOutcomeError
+
+USER_ID = 42
+
+
+def balance(standin, config, user_id=USER_ID):
+    return standin.balances[(str(config.GUILD_ID), str(user_id))]
+
+
+def test_patch_is_not_retried_after_a_timeout(config, economy):
+    config.ECONOMY_REQUEST_TIMEOUT = 0.2
+
+    async def scenario():
+        async with economy(late_reply=0.5) as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 10000, 0)
+            with pytest.raises(UnknownOutcomeError):
+                await service.update_balance(USER_ID, {"cash": -100})
+            await asyncio.sleep(0.5)
+            return balance(standin, config)
+
+    assert asyncio.run(scenario())["cash"] == 9900
+
+
+def test_patch_is_not_retried_after_a_server_error(config, economy):
+    async def scenario():
+        async with economy(error_rate=1.0) as (service, standin):
+            with pytest.raises(UnknownOutcomeError):
+                await service.update_balance(USER_ID, {"cash": -100})
+            return standin.responses
+
+    assert asyncio.run(scenario())[500] == 1
+
+
+def test_get_is_retried_after_a_server_error(config, economy):
+    async def scenario():
+        async with economy(error_rate=1.0) as (service, standin):
+            assert await service.get_balance(USER_ID, use_cache=False) is None
+            return standin.responses
+
+    assert asyncio.run(scenario())[500] == config.ECONOMY_MAX_RETRIES + 1
+
+
+def test_patch_is_retried_after_a_429(config, economy):
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 10000, 0)
+            standin.rate_limit_rate = 1.0
+            asyncio.get_running_loop().call_later(0.02, setattr, standin, "rate_limit_rate", 0.0)
+            assert await service.update_balance(USER_ID, {"cash": -100})
+            return balance(standin, config)
+
+    assert asyncio.run(scenario())["cash"] == 9900
+
+
+def test_deduct_items_marks_unknown_outcomes(config, economy):
+    config.ECONOMY_REQUEST_TIMEOUT = 0.2
+
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 300, 0)
+            await service.get_balance(USER_ID)
+            standin.late_reply = 0.5
+            return await service.deduct_items(USER_ID, [LineItem("Housing", 200), LineItem("Trauma Team", 500)])
+
+    success, results = asyncio.run(scenario())
+    assert not success
+    assert [(result.status, result.charged) for result in results] == [("unknown", 200), ("unpaid", 0)]
+
+
+def test_recovery_stays_under_the_header_rate_until_the_window_resets():
+    async def scenario():
+        limiter = TokenBucketLimiter(rate=1000, capacity=50, max_retries=0, backoff_base=0.01, backoff_max=0.1)
+        reset_ms = (time.time() + 0.5) * 1000
+        limiter.update_from_headers({"X-RateLimit-Limit": "50", "X-RateLimit-Remaining": "25", "X-RateLimit-Reset": str(reset_ms)})
+        learned = limiter.rate
+        for _ in range(100):
+            limiter._recover()
+        capped = limiter.rate
+
+        await asyncio.sleep(0.55)
+        limiter._recover()
+        return learned, capped, limiter.rate
+
+    learned, capped, after_reset = asyncio.run(scenario())
+    assert 40 <= learned <= 60
+    assert capped == learned
+    assert after_reset > learned
+
+
+def test_deduct_items_splits_cash_then_bank_and_charges_partial_items(config, economy):
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 300, 200)
+            items = [LineItem("Housing", 400), LineItem("Business", 300, allow_partial=True)]
+            success, results = await service.deduct_items(USER_ID, items)
+            return success, results, balance(standin, config)
+
+    success, results, after = asyncio.run(scenario())
+    assert not success
+    assert [(r.status, r.charged, r.cash, r.bank) for r in results] == [
+        ("paid", 400, 300, 100),
+        ("partial", 100, 0, 100)
+    ]
+    assert after == {"cash": 0, "bank": 0}
+
+
+def test_deduct_items_leaves_items_without_partial_payment_unpaid(config, economy):
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 500, 0)
+            items = [LineItem("Housing", 1000), LineItem("Monthly fee", 500)]
+            success, results = await service.deduct_items(USER_ID, items)
+            return success, results, balance(standin, config)
+
+    success, results, after = asyncio.run(scenario())
+    assert not success
+    assert [(r.status, r.charged) for r in results] == [("unpaid", 0), ("paid", 500)]
+    assert after == {"cash": 0, "bank": 0}
+
+
+def test_deduct_items_sends_nothing_when_nothing_can_be_charged(config, economy):
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, USER_ID, 0, 0)
+            success, results = await service.deduct_items(USER_ID, [LineItem("Housing", 1000)])
+            return success, results, sum(standin.responses.values())
+
+    success, results, responses = asyncio.run(scenario())
+    assert not success
+    assert results[0].status == "unpaid"
+    assert responses == 1  # the balance read only
@@ -0,0 +1,112 @@
+# tests/test_group_archive.py
+# Resuming an interrupted RP archive from its checkpoint and a torn transcript
+import asyncio
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from NightCityBot.NightCityBotGroupService import GroupRPModule
+
+BOT_USER_ID = 1
+THREAD_ID = 900
+CHANNEL_ID = 700
+
+
+def gzip_members(data):
+    """Decompress gzip members back to back, rejecting padding or garbage between them."""
+    text = b""
+    while data:
+        assert data[:2] == b"\x1f\x8b", "transcript has bytes that aren't a gzip member"
+        member = zlib.decompressobj(wbits=31)
+        text += member.decompress(data)
+        assert member.eof
+        data = member.unused_data
+    return text.decode()
+
+
+def rp_message(message_id, content, author_id=10):
+    return SimpleNamespace(
+        id=message_id,
+        created_at=datetime(2077, 1, 1, tzinfo=timezone.utc),
+        author=SimpleNamespace(id=author_id, display_name=f"user-{author_id}"),
+        content=content,
+        attachments=[]
+    )
+
+
+def rp_channel(messages, guild):
+    async def history(limit, after=None, oldest_first=True):
+        after_id = after.id if after else 0
+        for msg in [msg for msg in messages if msg.id > after_id][:limit]:
+            yield msg
+
+    return SimpleNamespace(
+        id=CHANNEL_ID,
+        name="text-rp-v-jackie",
+        guild=guild,
+        history=history,
+        send=AsyncMock(return_value=SimpleNamespace(edit=AsyncMock())),
+        delete=AsyncMock()
+    )
+
+
+def test_resume_after_a_torn_transcript_uploads_a_readable_transcript(config, tmp_path):
+    config.RP_ARCHIVE_CHECKPOINT_FILE = str(tmp_path / "checkpoints.json")
+    config.RP_TRANSCRIPT_DIR = str(tmp_path / "transcripts")
+
+    uploads = []
+
+    async def thread_send(content=None, file=None):
+        if file is not None:
+            uploads.append(file.fp.read())
+
+    log_thread = SimpleNamespace(id=THREAD_ID, send=AsyncMock(side_effect=thread_send))
+    bot = SimpleNamespace(
+        config=config,
+        user=SimpleNamespace(id=BOT_USER_ID),
+        get_channel=lambda channel_id: log_thread if channel_id == THREAD_ID else None
+    )
+    module = GroupRPModule(bot)
+    module.HISTORY_PAGE_SIZE = 1
+
+    archived = [rp_message(1, "Meet at the Afterlife"), rp_message(2, "On my way")]
+    remaining = [
+        # A progress message from the interrupted run makes a page with no records
+        rp_message(3, f"{module.PROGRESS_PREFIX}: 2 messages so far...", author_id=BOT_USER_ID),
+        rp_message(4, "Preem")
+    ]
+    channel = rp_channel(archived + remaining, SimpleNamespace(filesize_limit=10 * 1024 * 1024))
+
+    # The interrupted run checkpointed two messages, then crashed mid-write of the next page
+    transcript = module.transcript_path(CHANNEL_ID)
+    transcript.parent.mkdir(parents=True)
+    member = gzip.compress("".join(module.transcript_record(msg) for msg in archived).encode())
+    transcript.write_bytes(member + gzip.compress(b'{"id": 3}\n' * 50)[:40])
+    module.checkpoints = {str(CHANNEL_ID): {
+        "thread_id": THREAD_ID,
+        "last_message_id": 2,
+        "count": 2,
+        "pending": "",
+        "transcript_size": len(member),
+        "complete": False
+    }}
+
+    asyncio.run(module.end_rp_session(channel))
+
+    assert len(uploads) == 1
+    records = [json.loads(line) for line in gzip_members(uploads[0]).splitlines()]
+    assert [record["id"] for record in records] == [1, 2, 4]
+    channel.delete.assert_awaited_once()
+    assert module.checkpoints == {}
+    assert not transcript.exists()
+
+
+def test_appending_an_empty_page_returns_the_truncated_size(config, tmp_path):
+    module = GroupRPModule(SimpleNamespace(config=config))
+    path = tmp_path / "transcript.jsonl.gz"
+    path.write_bytes(b"x" * 1000)
+
+    assert module._append_transcript(path, [], 800) == 800
+    assert path.stat().st_size == 800
@@ -0,0 +1,130 @@
+# tests/test_messaging.py
+# !post resolves its destination, uploads attachments and runs relayed commands
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+import discord
+import pytest
+from NightCityBot.NightCityBotAttachments import AttachmentPipeline
+from NightCityBot.NightCityBotMessagingService import MessagingCog
+from .test_attachments import LARGE, SMALL, attachment, serve
+
+
+def text_channel(channel_id, name):
+    channel = MagicMock(spec=discord.TextChannel)
+    channel.id = channel_id
+    channel.name = name
+    channel.mention = f"<#{channel_id}>"
+    channel.guild = SimpleNamespace(filesize_limit=10 * 1024 * 1024)
+    channel.send = AsyncMock()
+    return channel
+
+
+@pytest.fixture
+def general():
+    return text_channel(100, "general")
+
+
+@pytest.fixture
+def cog(config, general):
+    bot = SimpleNamespace(
+        config=config,
+        dm_service=SimpleNamespace(set_bot=lambda bot: None, attachments=AttachmentPipeline()),
+        audit_service=SimpleNamespace(log_audit=AsyncMock()),
+        get_context=AsyncMock(),
+        invoke=AsyncMock()
+    )
+    return MessagingCog(bot)
+
+
+def context(general, content="", attachments=()):
+    guild = SimpleNamespace(
+        text_channels=[general],
+        threads=[],
+        get_channel_or_thread=lambda channel_id: general if channel_id == general.id else None,
+        fetch_channel=AsyncMock(side_effect=discord.NotFound(MagicMock(status=404), "Unknown Channel"))
+    )
+    return SimpleNamespace(
+        guild=guild,
+        author=SimpleNamespace(display_name="fixer"),
+        message=SimpleNamespace(content=content, attachments=list(attachments)),
+        send=AsyncMock()
+    )
+
+
+@pytest.mark.parametrize("destination", ["general", "#General", "<#100>", "100"])
+def test_destinations_resolve_by_name_mention_or_id(cog, general, destination):
+    assert asyncio.run(cog._resolve_destination(context(general), destination)) is general
+
+
+def test_unknown_destinations_are_reported(cog, general):
+    ctx = context(general)
+    asyncio.run(cog.post.callback(cog, ctx, "999", message="hi"))
+    ctx.send.assert_awaited_once_with("❌ Couldn't find channel/thread '999'.")
+
+
+def test_post_uploads_attachments_with_the_message(cog, general):
+    uploaded = []
+
+    async def send(content=None, files=None):
+        uploaded.append((content, [(file.filename, file.fp.read()) for file in files or []]))
+
+    general.send.side_effect = send
+
+    async def scenario():
+        runner, base = await serve()
+        try:
+            ctx = context(general, attachments=[
+                attachment(f"{base}/small", "small.txt", len(SMALL)),
+                attachment(f"{base}/large", "large.bin", len(LARGE))
+            ])
+            await cog.post.callback(cog, ctx, "#general", message="Job board update")
+            return ctx
+        finally:
+            await cog.attachments.close()
+            await runner.cleanup()
+
+    ctx = asyncio.run(scenario())
+    assert uploaded == [("Job board update", [("small.txt", SMALL), ("large.bin", LARGE)])]
+    ctx.send.assert_awaited_once_with(f"✅ Posted anonymously to {general.mention}.")
+    cog.bot.audit_service.log_audit.assert_awaited_once()
+
+
+def test_post_accepts_attachments_without_a_message(cog, general):
+    async def scenario():
+        runner, base = await serve()
+        try:
+            ctx = context(general, attachments=[attachment(f"{base}/small", "small.txt", len(SMALL))])
+            await cog.post.callback(cog, ctx, "general")
+            return ctx
+        finally:
+            await cog.attachments.close()
+            await runner.cleanup()
+
+    ctx = asyncio.run(scenario())
+    assert general.send.await_args.kwargs["content"] is None
+    assert [file.filename for file in general.send.await_args.kwargs["files"]] == ["small.txt"]
+    ctx.send.assert_awaited_once_with(f"✅ Posted anonymously to {general.mention}.")
+
+
+def test_post_runs_commands_in_the_destination(cog, general):
+    ctx = context(general, content="!post general !roll 1d20")
+    cog.bot.get_context.return_value = SimpleNamespace(command=object(), invoked_with="roll")
+
+    asyncio.run(cog.post.callback(cog, ctx, "general", message="!roll 1d20"))
+    relayed = cog.bot.get_context.await_args.args[0]
+    assert (relayed.channel, relayed.content) == (general, "!roll 1d20")
+    assert ctx.message.content == "!post general !roll 1d20"
+    cog.bot.invoke.assert_awaited_once_with(cog.bot.get_context.return_value)
+
+
+def test_dm_roll_is_rolled_for_the_user_by_the_dice_cog(cog, general):
+    dice_cog = SimpleNamespace(loggable_roll=AsyncMock())
+    cog.bot.get_cog = lambda name: dice_cog if name == "DiceModule" else None
+    user = SimpleNamespace(id=42, display_name="V")
+    ctx = context(general)
+    ctx.channel = general
+
+    asyncio.run(cog.dm.callback(cog, ctx, user, message="!roll 2d6+1"))
+    dice_cog.loggable_roll.assert_awaited_once_with(user, general, "2d6+1", original_sender=ctx.author)
+    cog.bot.audit_service.log_audit.assert_awaited_once()
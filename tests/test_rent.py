@@ -0,0 +1,168 @@
+# tests/test_rent.py
+# Rent journal parsing and resuming interrupted rent runs against the UnbelievaBoat stand-in
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+from NightCityBot.NightCityBotRentService import RentJournal, RentService
+
+
+def make_guild(*members):
+    """Members are (user_id, [role names])."""
+    return SimpleNamespace(members=[
+        SimpleNamespace(
+            id=user_id,
+            display_name=f"member-{user_id}",
+            bot=False,
+            roles=[SimpleNamespace(name=name) for name in roles]
+        )
+        for user_id, roles in members
+    ])
+
+
+def write_journal(path, *records, torn_tail=""):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(torn_tail)
+
+
+def test_journal_load_skips_torn_lines_and_other_runs(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(
+        path,
+        {"run": "a", "user": 1, "status": "charged", "amount": 1500},
+        {"run": "b", "user": 2, "status": "charged", "amount": 900},
+        {"run": "a", "user": 3, "status": "failed", "amount": 0},
+        {"run": "a", "user": 4, "status": "unknown", "amount": 700},
+        torn_tail='{"run": "a", "user": 5, "sta'
+    )
+
+    charged, unknown = RentJournal(str(path), 1, 1.0).load("a")
+    assert charged == {1: 1500}
+    assert unknown == {4: 700}
+
+
+def test_journal_load_treats_an_attempt_without_outcome_as_unknown(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(
+        path,
+        {"run": "a", "user": 1, "status": "attempt", "amount": 1500},
+        {"run": "a", "user": 1, "status": "charged", "amount": 1500},
+        {"run": "a", "user": 2, "status": "attempt", "amount": 900},
+        {"run": "a", "user": 3, "status": "attempt", "amount": 500},
+        {"run": "a", "user": 3, "status": "failed", "amount": 0}
+    )
+
+    charged, unknown = RentJournal(str(path), 1, 1.0).load("a")
+    assert charged == {1: 1500}
+    assert unknown == {2: 900}
+
+
+def test_interrupted_run_resumes_without_charging_anyone_twice(config, economy):
+    # Housing Tier 1 (1000) plus the flat monthly fee (500)
+    guild = make_guild((1, ["Housing Tier 1"]), (2, ["Housing Tier 1"]), (3, ["Housing Tier 1"]), (4, ["Verified"]))
+    with open(config.LAST_RENT_FILE, "w") as f:
+        json.dump({"run_id": "interrupted", "status": "in_progress"}, f)
+    write_journal(
+        config.RENT_JOURNAL_FILE,
+        {"run": "interrupted", "user": 1, "status": "charged", "amount": 1500},
+        {"run": "interrupted", "user": 2, "status": "unknown", "amount": 1500},
+        torn_tail='{"run": "interrupted", "user": 3, "status": "char'
+    )
+
+    async def scenario():
+        async with economy() as (service, standin):
+            for user_id in (1, 2, 3):
+                standin.set_balance(config.GUILD_ID, user_id, 2000, 0)
+            rent = RentService(SimpleNamespace(get_channel=lambda channel_id: None), config, service)
+            summary = await rent.collect_rent(guild)
+            cash = {user_id: standin.balances[(str(config.GUILD_ID), str(user_id))]["cash"] for user_id in (1, 2, 3)}
+            return summary, cash
+
+    summary, cash = asyncio.run(scenario())
+    assert cash == {1: 2000, 2: 2000, 3: 500}
+    assert (summary.billed, summary.resumed, summary.charged, summary.collected) == (3, 1, 2, 3000)
+    assert [(bill.user_id, amount) for bill, amount in summary.unknown] == [(2, 1500)]
+
+    with open(config.LAST_RENT_FILE) as f:
+        last_rent = json.load(f)
+    assert last_rent["status"] == "complete"
+    assert last_rent["unknown"] == [2]
+    assert not os.path.exists(config.RENT_JOURNAL_FILE)
+
+
+def test_new_run_starts_a_fresh_journal(config, economy):
+    guild = make_guild((1, ["Housing Tier 1"]))
+    with open(config.LAST_RENT_FILE, "w") as f:
+        json.dump({"run_id": "old", "status": "complete"}, f)
+    write_journal(config.RENT_JOURNAL_FILE, {"run": "old", "user": 1, "status": "charged", "amount": 1500})
+
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, 1, 2000, 0)
+            rent = RentService(SimpleNamespace(get_channel=lambda channel_id: None), config, service)
+            summary = await rent.collect_rent(guild)
+            return summary, standin.balances[(str(config.GUILD_ID), "1")]["cash"]
+
+    summary, cash = asyncio.run(scenario())
+    assert (summary.resumed, summary.charged, cash) == (0, 1, 500)
+
+
+def test_records_appended_after_a_torn_line_stay_readable(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(path, {"run": "a", "user": 1, "status": "charged", "amount": 1500}, torn_tail='{"run": "a", "us')
+
+    async def scenario():
+        journal = RentJournal(str(path), 1, 1.0)
+        journal.open()
+        await journal.record("a", 2, "charged", 900)
+        await journal.close()
+        return journal.load("a")
+
+    charged, _ = asyncio.run(scenario())
+    assert charged == {1: 1500, 2: 900}
+
+
+def test_resume_skips_members_whose_charge_was_in_flight(config, economy):
+    guild = make_guild((1, ["Housing Tier 1"]), (2, ["Housing Tier 1"]))
+    with open(config.LAST_RENT_FILE, "w") as f:
+        json.dump({"run_id": "interrupted", "status": "in_progress"}, f)
+    # Member 1's PATCH was applied but the process died before its outcome was journalled
+    write_journal(config.RENT_JOURNAL_FILE, {"run": "interrupted", "user": 1, "status": "attempt", "amount": 1500})
+
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, 1, 500, 0)
+            standin.set_balance(config.GUILD_ID, 2, 2000, 0)
+            rent = RentService(SimpleNamespace(get_channel=lambda channel_id: None), config, service)
+            summary = await rent.collect_rent(guild)
+            cash = {user_id: standin.balances[(str(config.GUILD_ID), str(user_id))]["cash"] for user_id in (1, 2)}
+            return summary, cash
+
+    summary, cash = asyncio.run(scenario())
+    assert cash == {1: 500, 2: 500}
+    assert (summary.charged, summary.collected) == (1, 1500)
+    assert [(bill.user_id, amount) for bill, amount in summary.unknown] == [(1, 1500)]
+
+
+def test_worker_journals_the_attempt_before_charging(config, economy):
+    guild = make_guild((1, ["Housing Tier 1"]))
+    statuses = []
+
+    async def scenario():
+        async with economy() as (service, standin):
+            standin.set_balance(config.GUILD_ID, 1, 2000, 0)
+            rent = RentService(SimpleNamespace(get_channel=lambda channel_id: None), config, service)
+            deduct_items = service.deduct_items
+
+            async def journal_then_deduct(*args, **kwargs):
+                with open(config.RENT_JOURNAL_FILE) as f:
+                    statuses.extend(json.loads(line)["status"] for line in f)
+                return await deduct_items(*args, **kwargs)
+
+            service.deduct_items = journal_then_deduct
+            await rent.collect_rent(guild)
+
+    asyncio.run(scenario())
+    assert statuses == ["attempt"]
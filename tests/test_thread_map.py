@@ -0,0 +1,87 @@
+# tests/test_thread_map.py
+# DM thread map persistence: snapshot plus change log replay, torn records and compaction
+import asyncio
+import json
+from NightCityBot.NightCityBotDMService import DMService, ThreadMapStore
+
+
+def make_store(config):
+    return ThreadMapStore(config.THREAD_MAP_FILE, dict, compact_after=1000, flush_delay=0)
+
+
+def write_log(config, *records, torn_tail=""):
+    with open(f"{config.THREAD_MAP_FILE}.log", "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(torn_tail)
+
+
+def test_load_replays_the_log_over_the_snapshot(config):
+    with open(config.THREAD_MAP_FILE, "w") as f:
+        json.dump({"1": 100, "2": 200}, f)
+    write_log(
+        config,
+        {"op": "set", "user": "3", "thread": 300},
+        {"op": "set", "user": "1", "thread": 101},
+        {"op": "del", "user": "2"}
+    )
+
+    assert make_store(config).load() == {"1": 101, "3": 300}
+
+
+def test_torn_log_record_is_dropped_and_later_appends_stay_readable(config):
+    write_log(config, {"op": "set", "user": "1", "thread": 100}, torn_tail='{"op": "set", "user": "2", "thr')
+
+    async def scenario():
+        store = make_store(config)
+        mapping = store.load()
+        store.record_set("3", 300)
+        await store.flush()
+        return mapping
+
+    assert asyncio.run(scenario()) == {"1": 100}
+    assert make_store(config).load() == {"1": 100, "3": 300}
+
+
+def test_removals_survive_a_reload(config):
+    async def scenario():
+        service = DMService(config)
+        await service.load_thread_map()
+        service._set_thread("1", 100)
+        service._set_thread("2", 200)
+        await service.save_thread_map()
+        service._remove_thread("1")
+        await service.save_thread_map()
+
+        reloaded = DMService(config)
+        await reloaded.load_thread_map()
+        return reloaded
+
+    reloaded = asyncio.run(scenario())
+    assert reloaded.dm_threads == {"2": 200}
+    assert reloaded.get_thread_user(100) is None
+    assert reloaded.get_thread_user(200) == "2"
+
+
+def test_compaction_folds_the_log_into_the_snapshot(config):
+    config.THREAD_MAP_COMPACT_AFTER = 4
+    config.THREAD_MAP_FLUSH_DELAY = 0
+
+    async def scenario():
+        service = DMService(config)
+        await service.load_thread_map()
+        for user_id in ("1", "2", "3"):
+            service._set_thread(user_id, int(user_id) * 100)
+        await service.save_thread_map()
+        service._remove_thread("2")
+        await service.save_thread_map()
+
+        reloaded = DMService(config)
+        await reloaded.load_thread_map()
+        return reloaded.dm_threads
+
+    assert asyncio.run(scenario()) == {"1": 100, "3": 300}
+    with open(config.THREAD_MAP_FILE) as f:
+        assert json.load(f) == {"1": 100, "3": 300}
+    with open(f"{config.THREAD_MAP_FILE}.log") as f:
+        assert f.read() == ""